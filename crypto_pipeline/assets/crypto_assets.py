@@ -3,8 +3,8 @@ Assets Dagster pour les données de cryptomonnaies.
 """
 
 import pandas as pd
-import matplotlib.pyplot as plt
-from datetime import datetime, timedelta
+import pyarrow as pa
+from datetime import date, datetime, timedelta
 from dagster import (
     asset, 
     AssetExecutionContext, 
@@ -18,44 +18,78 @@ from dagster import (
     AssetOut
 )
 from typing import List, Dict, Any, Tuple
-import time
 import os
 
-# Utiliser une date fixe au lieu de datetime.now() pour éviter des instances différentes
+from crypto_pipeline.resources.duckdb_resource import (
+    COIN_LIST_SCHEMA,
+    EMPTY_TOP_COINS,
+    MARKET_DATA_SCHEMA,
+    to_arrow_table,
+)
+
+# Utiliser une date fixe au lieu de datetime.now() pour éviter des instances différentes :
+# tous les processus (daemon, serveur de code, CLI) lisent la même valeur, éventuellement
+# surchargée par la variable d'environnement CRYPTO_PIPELINE_START_DATE (AAAA-MM-JJ)
 # IMPORTANT: Utiliser datetime.datetime et non datetime.date
-START_DATE = datetime(2023, 1, 1)
-# Définition des partitions quotidiennes depuis le 1er janvier 2023
+START_DATE = datetime.fromisoformat(os.environ.get("CRYPTO_PIPELINE_START_DATE", "2023-01-01"))
+# Les partitions restent en UTC : une partition journalière couvre exactement une
+# partition dt=AAAA-MM-JJ du dataset Parquet de l'historique des prix (dates UTC).
+# Seuls les schedules sont exécutés à l'heure de Paris (SCHEDULES_TIMEZONE).
+SCHEDULES_TIMEZONE = "Europe/Paris"
+
+# Définition des partitions quotidiennes depuis le 1er janvier 2023 (par défaut)
 DAILY_PARTITIONS = DailyPartitionsDefinition(start_date=START_DATE)
 
 # Définition des partitions mensuelles pour les rapports
 MONTHLY_PARTITIONS = MonthlyPartitionsDefinition(start_date=datetime(2023, 1, 1))
 
+def _partition_or_today(context, fmt: str = "%Y-%m-%d") -> str:
+    """
+    Retourne la clé de partition du run, ou la date du jour au format `fmt`
+    si le run n'est pas partitionné.
+    """
+    if context.has_partition_key:
+        return context.partition_key
+    partition_date = datetime.now().strftime(fmt)
+    context.log.info(f"Run non partitionné. Utilisation de la date du jour {partition_date}")
+    return partition_date
+
+# Pools de concurrence Dagster : la limite fixée sur l'instance (.dagster/dagster.yaml)
+# borne le nombre d'étapes simultanées entre runs, par exemple pendant un backfill.
+# Un pool pour les assets qui appellent l'API CoinGecko, un pour tous les assets qui
+# ouvrent la base DuckDB, en écriture comme en lecture : un seul processus peut
+# l'ouvrir à la fois (verrou du fichier)
+COINGECKO_POOL = "coingecko"
+DUCKDB_WRITER_POOL = "duckdb_writer"
+
 # Liste des principales cryptomonnaies à suivre
-TOP_CRYPTO_COINS = ["bitcoin", "ethereum", "solana", "binancecoin", "cardano", "polkadot", "dogecoin", "ripple", "avalanche-2", "tron"]
+TOP_CRYPTO_COINS: Tuple[str, ...] = ("bitcoin", "ethereum", "solana", "binancecoin", "cardano", "polkadot", "dogecoin", "ripple", "avalanche-2", "tron")
+# Même liste sous forme d'ensemble pour les tests d'appartenance (l'ordre est donné par le tuple)
+TOP_CRYPTO_COINS_SET: frozenset = frozenset(TOP_CRYPTO_COINS)
 
 @asset(
     description="Extrait la liste complète des cryptomonnaies depuis l'API CoinGecko",
     group_name="extract",
     required_resource_keys={"coingecko_resource"},
+    pool=COINGECKO_POOL,
     partitions_def=DAILY_PARTITIONS,
+    io_manager_key="parquet_io_manager",
 )
-def crypto_coins_list(context: AssetExecutionContext) -> List[Dict[str, str]]:
+def crypto_coins_list(context: AssetExecutionContext) -> pa.Table:
     """
     Récupère la liste complète des cryptomonnaies depuis l'API CoinGecko.
     """
-    # Vérifier si le job est exécuté avec des partitions
-    try:
-        partition_date = context.partition_key
-        context.log.info(f"Extraction de la liste des cryptomonnaies pour la partition {partition_date}")
-    except:
-        # Si le run n'est pas partitionné, utiliser la date du jour
-        partition_date = datetime.now().strftime("%Y-%m-%d")
-        context.log.info(f"Run non partitionné. Extraction de la liste des cryptomonnaies pour la date {partition_date}")
+    partition_date = _partition_or_today(context)
+    context.log.info(f"Extraction de la liste des cryptomonnaies pour la partition {partition_date}")
         
     coins = context.resources.coingecko_resource.get_coin_list()
-    context.log.info(f"Récupération de {len(coins)} cryptomonnaies")
     
-    return coins
+    # Dédoublonner par identifiant avant la conversion en table Arrow
+    unique_coins = {coin["id"]: coin for coin in coins}.values()
+    coins_table = to_arrow_table(unique_coins, COIN_LIST_SCHEMA)
+    context.log.info(f"Récupération de {coins_table.num_rows} cryptomonnaies")
+    
+    return coins_table
 
 @asset(
     description="Stocke la liste des cryptomonnaies dans DuckDB",
@@ -63,23 +97,15 @@ def crypto_coins_list(context: AssetExecutionContext) -> List[Dict[str, str]]:
     deps=["crypto_coins_list"],
     required_resource_keys={"duckdb_resource"},
     partitions_def=DAILY_PARTITIONS,
+    pool=DUCKDB_WRITER_POOL,
 )
-def store_crypto_list(context: AssetExecutionContext, crypto_coins_list) -> None:
+def store_crypto_list(context: AssetExecutionContext, crypto_coins_list: pa.Table) -> None:
     """
     Stocke la liste des cryptomonnaies dans la base de données DuckDB.
     """
-    # Vérifier si le job est exécuté avec des partitions
-    try:
-        partition_date = context.partition_key
-        context.log.info(f"Stockage de {len(crypto_coins_list)} cryptomonnaies dans la base de données pour la partition {partition_date}")
-    except:
-        # Si le run n'est pas partitionné, utiliser la date du jour
-        partition_date = datetime.now().strftime("%Y-%m-%d")
-        context.log.info(f"Run non partitionné. Stockage de {len(crypto_coins_list)} cryptomonnaies pour la date {partition_date}")
+    partition_date = _partition_or_today(context)
+    context.log.info(f"Stockage de {len(crypto_coins_list)} cryptomonnaies dans la base de données pour la partition {partition_date}")
         
-    # Créer les tables si elles n'existent pas
-    context.resources.duckdb_resource.create_tables()
-    
     # Stocker les données
     context.resources.duckdb_resource.store_coin_list(crypto_coins_list)
 
@@ -89,25 +115,26 @@ def store_crypto_list(context: AssetExecutionContext, crypto_coins_list) -> None
     group_name="extract",
     partitions_def=DAILY_PARTITIONS,
     required_resource_keys={"coingecko_resource"},
+    pool=COINGECKO_POOL,
     deps=["store_crypto_list"],
+    io_manager_key="parquet_io_manager",
 )
-def crypto_market_data(context: AssetExecutionContext) -> List[Dict[str, Any]]:
+def crypto_market_data(context: AssetExecutionContext) -> pa.Table:
     """
     Récupère les données de marché pour les principales cryptomonnaies.
     """
-    # Vérifier si le job est exécuté avec des partitions
-    try:
-        partition_date = context.partition_key
-        context.log.info(f"Extraction des données de marché pour la partition {partition_date}")
-    except:
-        # Si le run n'est pas partitionné, utiliser la date du jour
-        partition_date = datetime.now().strftime("%Y-%m-%d")
-        context.log.info(f"Run non partitionné. Extraction des données de marché pour la date {partition_date}")
+    partition_date = _partition_or_today(context)
+    context.log.info(f"Extraction des données de marché pour la partition {partition_date}")
 
-    market_data = context.resources.coingecko_resource.get_coin_market_data(TOP_CRYPTO_COINS)
-    context.log.info(f"Récupération de {len(market_data)} entrées de données de marché")
+    # Une requête par lot de 250 identifiants, consommée directement par la conversion Arrow
+    market_data = context.resources.coingecko_resource.get_coin_market_data_paged(TOP_CRYPTO_COINS)
+    market_table = to_arrow_table(market_data, MARKET_DATA_SCHEMA)
+    context.log.info(f"Récupération de {market_table.num_rows} entrées de données de marché")
+    missing_coins = TOP_CRYPTO_COINS_SET.difference(market_table.column("id").to_pylist())
+    if missing_coins:
+        context.log.warning(f"Données de marché absentes de la réponse pour : {', '.join(sorted(missing_coins))}")
 
-    return market_data
+    return market_table
 
 @asset(
     description="Stocke les données de marché dans DuckDB",
@@ -115,25 +142,19 @@ def crypto_market_data(context: AssetExecutionContext) -> List[Dict[str, Any]]:
     deps=["crypto_market_data"],
     required_resource_keys={"duckdb_resource"},
     partitions_def=DAILY_PARTITIONS,
+    pool=DUCKDB_WRITER_POOL,
 )
-def store_market_data(context: AssetExecutionContext, crypto_market_data) -> None:
+def store_market_data(context: AssetExecutionContext, crypto_market_data: pa.Table) -> None:
     """
     Stocke les données de marché dans la base de données DuckDB.
     """
-    # Vérifier si le job est exécuté avec des partitions
-    try:
-        partition_date = context.partition_key
-        context.log.info(f"Stockage des données de marché pour la partition {partition_date}")
-    except:
-        # Si le run n'est pas partitionné, utiliser la date du jour
-        partition_date = datetime.now().strftime("%Y-%m-%d")
-        context.log.info(f"Run non partitionné. Stockage des données de marché pour la date {partition_date}")
+    partition_date = _partition_or_today(context)
+    context.log.info(f"Stockage des données de marché pour la partition {partition_date}")
         
-    # Créer les tables si elles n'existent pas
-    context.resources.duckdb_resource.create_tables()
-    
-    # Stocker les données
-    context.resources.duckdb_resource.store_market_data(crypto_market_data)
+    # Stocker les données à la date de la partition (et non à la date du jour, pour les backfills)
+    context.resources.duckdb_resource.store_market_data(
+        crypto_market_data, partition_date=date.fromisoformat(partition_date)
+    )
 
 @asset(
     group_name="extract",
@@ -141,51 +162,39 @@ def store_market_data(context: AssetExecutionContext, crypto_market_data) -> Non
     deps=["store_market_data"],
     partitions_def=DAILY_PARTITIONS,
     required_resource_keys={"coingecko_resource"},
+    pool=COINGECKO_POOL,
 )
 def crypto_price_history(context) -> List[Dict[str, Any]]:
     """Extrait l'historique des prix pour les 4 principales cryptomonnaies."""
     # Liste des 4 principales cryptomonnaies à suivre
-    COINS_TO_TRACK = ["bitcoin", "ethereum", "binancecoin", "cardano"]
+    COINS_TO_TRACK = ("bitcoin", "ethereum", "binancecoin", "cardano")
     
     try:
-        # Vérifier si le job est exécuté avec des partitions
-        try:
-            partition_date = context.partition_key
-            context.log.info(f"Extraction de l'historique des prix pour la partition {partition_date}")
-        except:
-            # Si le run n'est pas partitionné, utiliser la date du jour
-            partition_date = datetime.now().strftime("%Y-%m-%d")
-            context.log.info(f"Run non partitionné. Extraction de l'historique des prix pour la date {partition_date}")
+        partition_date = _partition_or_today(context)
+        context.log.info(f"Extraction de l'historique des prix pour la partition {partition_date}")
         
         context.log.info(f"Extraction de l'historique des prix pour {len(COINS_TO_TRACK)} cryptomonnaies")
-        price_history = []
         
-        for coin_id in COINS_TO_TRACK:
-            try:
-                # Ajouter un délai de 2 secondes entre chaque requête
-                time.sleep(2)
-                history = context.resources.coingecko_resource.get_coin_price_history(coin_id)
-                price_history.append({
-                    "coin_id": coin_id,
-                    "history": history
-                })
-                context.log.info(f"Historique extrait pour {coin_id}")
-            except Exception as e:
-                if "429" in str(e):
-                    context.log.warning(f"Limite de taux atteinte pour {coin_id}. Attente de 60 secondes...")
-                    time.sleep(60)  # Attendre 60 secondes en cas de limite atteinte
-                    try:
-                        history = context.resources.coingecko_resource.get_coin_price_history(coin_id)
-                        price_history.append({
-                            "coin_id": coin_id,
-                            "history": history
-                        })
-                        context.log.info(f"Historique extrait pour {coin_id} après attente")
-                    except Exception as retry_e:
-                        context.log.error(f"Échec de la récupération après attente pour {coin_id}: {str(retry_e)}")
-                else:
-                    context.log.error(f"Erreur lors de la récupération de l'historique des prix pour {coin_id}: {str(e)}")
-                continue
+        # Une requête /market_chart/range par cryptomonnaie couvre toute la fenêtre de la partition ;
+        # la ressource n'en garde qu'un point par jour, comme sans partition (interval=daily)
+        window = {}
+        if context.has_partition_key:
+            time_window = context.partition_time_window
+            window = {
+                "from_ts": int(time_window.start.timestamp()),
+                "to_ts": int(time_window.end.timestamp()),
+            }
+        
+        # Les requêtes sont parallélisées par la ressource, qui gère le rythme et les erreurs 429
+        histories = context.resources.coingecko_resource.get_price_histories(COINS_TO_TRACK, **window)
+        price_history = [
+            {"coin_id": coin_id, "history": history}
+            for coin_id, history in histories.items()
+        ]
+        
+        missing = [coin_id for coin_id in COINS_TO_TRACK if coin_id not in histories]
+        if missing:
+            context.log.warning(f"Historique indisponible pour {', '.join(missing)}")
         
         context.log.info(f"Extraction de l'historique terminée. {len(price_history)} cryptomonnaies traitées")
         return price_history
@@ -200,6 +209,7 @@ def crypto_price_history(context) -> List[Dict[str, Any]]:
     deps=["crypto_price_history"],
     required_resource_keys={"duckdb_resource"},
     partitions_def=DAILY_PARTITIONS,
+    pool=DUCKDB_WRITER_POOL,
 )
 def store_price_history(context: AssetExecutionContext, crypto_price_history) -> None:
     """
@@ -207,17 +217,11 @@ def store_price_history(context: AssetExecutionContext, crypto_price_history) ->
     """
     try:
         # Récupérer la date de partition
-        partition_date = context.partition_key
+        partition_date = _partition_or_today(context)
         context.log.info(f"Stockage de l'historique des prix pour la partition {partition_date}")
         
-        # Créer les tables si elles n'existent pas
-        context.resources.duckdb_resource.create_tables()
-        
-        # Stocker les données
-        for coin_data in crypto_price_history:
-            coin_id = coin_data["coin_id"]
-            history = coin_data["history"]
-            context.resources.duckdb_resource.store_price_history(coin_id, history)
+        # Stocker les données de toutes les cryptomonnaies en une seule insertion
+        context.resources.duckdb_resource.store_price_histories(crypto_price_history)
             
         context.log.info(f"Stockage terminé pour la partition {partition_date}")
         
@@ -230,6 +234,7 @@ def store_price_history(context: AssetExecutionContext, crypto_price_history) ->
     group_name="transform",
     deps=["store_market_data", "store_price_history"],
     required_resource_keys={"duckdb_resource"},
+    pool=DUCKDB_WRITER_POOL,
 )
 def crypto_price_trends(context: AssetExecutionContext) -> pd.DataFrame:
     """
@@ -237,9 +242,6 @@ def crypto_price_trends(context: AssetExecutionContext) -> pd.DataFrame:
     """
     context.log.info("Analyse des tendances de prix des cryptomonnaies")
     
-    # Créer les tables si elles n'existent pas
-    context.resources.duckdb_resource.create_tables()
-    
     try:
         # Récupérer les données des 10 principales cryptomonnaies
         top_coins = context.resources.duckdb_resource.get_top_coins(10)
@@ -248,7 +250,7 @@ def crypto_price_trends(context: AssetExecutionContext) -> pd.DataFrame:
     except Exception as e:
         context.log.error(f"Erreur lors de l'analyse des tendances de prix: {e}")
         # Retourner un DataFrame vide en cas d'erreur
-        return pd.DataFrame(columns=['id', 'name', 'price', 'market_cap', 'price_change_percentage_24h'])
+        return EMPTY_TOP_COINS.copy()
 
 @asset(
     description="Visualisation des tendances de prix",
@@ -262,19 +264,21 @@ def crypto_price_visualization(context: AssetExecutionContext, crypto_price_tren
     """
     context.log.info("Génération de la visualisation des tendances de prix")
     
-    # Créer un graphique
-    plt.figure(figsize=(12, 8))
-    plt.bar(crypto_price_trends['name'], crypto_price_trends['price_change_percentage_24h'])
-    plt.title("Variation de prix sur 24h pour les principales cryptomonnaies")
-    plt.xlabel("Cryptomonnaie")
-    plt.ylabel("Variation en %")
-    plt.xticks(rotation=45)
-    plt.grid(True, axis='y')
+    # Import différé : seuls les assets de visualisation paient le coût de matplotlib
+    from crypto_pipeline.utils.visualization import _get_fig
+    
+    # Créer un graphique (figure du pool partagé avec les utilitaires de visualisation)
+    fig, (ax,) = _get_fig(1, 1, (12, 8))
+    ax.bar(crypto_price_trends['name'], crypto_price_trends['price_change_percentage_24h'])
+    ax.set_title("Variation de prix sur 24h pour les principales cryptomonnaies")
+    ax.set_xlabel("Cryptomonnaie")
+    ax.set_ylabel("Variation en %")
+    ax.tick_params(axis='x', labelrotation=45)
+    ax.grid(True, axis='y')
     
     # Sauvegarder le graphique
     file_path = "crypto_pipeline/data/price_trends.png"
-    plt.savefig(file_path)
-    plt.close()
+    fig.savefig(file_path)
     
     context.log.info(f"Visualisation sauvegardée dans {file_path}")
     return file_path
@@ -290,88 +294,85 @@ def crypto_price_visualization(context: AssetExecutionContext, crypto_price_tren
     group_name="reporting",
     partitions_def=MONTHLY_PARTITIONS,
     required_resource_keys={"duckdb_resource"},
+    pool=DUCKDB_WRITER_POOL,
 )
 def monthly_crypto_report(context: AssetExecutionContext) -> Tuple[pd.DataFrame, str]:
     """
     Génère un rapport mensuel sur les performances des cryptomonnaies.
     """
-    try:
-        month = context.partition_key
-        context.log.info(f"Génération du rapport mensuel pour la partition {month}")
-    except:
-        month = datetime.now().strftime("%Y-%m")
-        context.log.info(f"Run non partitionné. Génération du rapport mensuel pour {month}")
-    
-    context.resources.duckdb_resource.create_tables()
+    month = _partition_or_today(context, fmt="%Y-%m")
+    context.log.info(f"Génération du rapport mensuel pour la partition {month}")
     
     try:
-        # Récupérer les données pour les 10 principales cryptomonnaies
-        top_coins = context.resources.duckdb_resource.get_top_coins(10)
+        # Bornes du mois de la partition (fin exclue)
+        month_start = pd.Timestamp(month).to_period('M').to_timestamp()
+        month_end = month_start + pd.offsets.MonthBegin(1)
+        yearMonth = month_start.strftime("%Y-%m")
+        
+        # Récupérer les 10 principales cryptomonnaies et leur historique du mois en une requête
+        report = context.resources.duckdb_resource.get_top_coins_with_history(10, month_start.date(), month_end.date())
+        top_coins = (
+            report.drop_duplicates('id')[['id', 'name', 'price', 'market_cap', 'price_change_percentage_24h']]
+            .reset_index(drop=True)
+        )
+        history = report.dropna(subset=['timestamp'])
         
-        # Créer une figure avec plusieurs sous-graphiques
-        fig = plt.figure(figsize=(20, 15))
+        from matplotlib.ticker import PercentFormatter
+        from crypto_pipeline.utils.visualization import _get_fig, _save_png
+        
+        # Créer une figure avec plusieurs sous-graphiques (grille 2x2 du pool de figures)
+        fig, (ax1, ax2, ax3, ax4) = _get_fig(2, 2, (20, 15))
         
         # 1. Graphique des variations de prix sur 24h
-        ax1 = plt.subplot(2, 2, 1)
         ax1.bar(top_coins['name'], top_coins['price_change_percentage_24h'])
         ax1.set_title(f"Variation de prix sur 24h - {month}")
         ax1.set_xlabel("Cryptomonnaie")
         ax1.set_ylabel("Variation en %")
-        plt.xticks(rotation=45)
+        ax1.tick_params(axis='x', labelrotation=45)
         ax1.grid(True, axis='y')
         
-        # 2. Graphique de la capitalisation boursière
-        ax2 = plt.subplot(2, 2, 2)
-        ax2.pie(top_coins['market_cap'], labels=top_coins['name'], autopct='%1.1f%%')
+        # 2. Graphique de la capitalisation boursière (part en %, barres horizontales)
+        market_cap_share = top_coins['market_cap'] / top_coins['market_cap'].sum() * 100
+        ax2.barh(top_coins['name'], market_cap_share)
+        ax2.xaxis.set_major_formatter(PercentFormatter())
+        ax2.invert_yaxis()  # Pour que la plus grande capitalisation soit en haut
         ax2.set_title(f"Répartition de la capitalisation boursière - {month}")
         
         # 3. Graphique des prix actuels
-        ax3 = plt.subplot(2, 2, 3)
         ax3.bar(top_coins['name'], top_coins['price'])
         ax3.set_title(f"Prix actuels des cryptomonnaies - {month}")
         ax3.set_xlabel("Cryptomonnaie")
         ax3.set_ylabel("Prix en USD")
-        plt.xticks(rotation=45)
+        ax3.tick_params(axis='x', labelrotation=45)
         ax3.grid(True, axis='y')
         
         # 4. Graphique de l'évolution des prix sur le mois
-        ax4 = plt.subplot(2, 2, 4)
-        yearMonth = datetime.strptime(month, "%Y-%m-%d").strftime("%Y-%m")
-        for coin_id in top_coins['id']:
-            history = context.resources.duckdb_resource.get_coin_price_history(coin_id)
-            if not history.empty:
-                # Convertir les timestamps et filtrer par mois
-                history['timestamp'] = pd.to_datetime(history['timestamp'])
-                filtered_history = history[history['timestamp'].dt.strftime('%Y-%m') == yearMonth]
-
-                # Vérifier si les données filtrées ne sont pas vides
-                if not filtered_history.empty:
-                    ax4.plot(filtered_history['timestamp'], filtered_history['price'], label=coin_id)
-                else:
-                    context.log.warning(f"Aucune donnée disponible pour {coin_id} sur le mois {yearMonth}")
-            else:
-                context.log.warning(f"Aucune donnée d'historique pour {coin_id}")
+        for coin_id, coin_history in history.groupby('id', sort=False):
+            ax4.plot(coin_history['timestamp'], coin_history['hist_price'], label=coin_id)
+        for coin_id in top_coins['id'][~top_coins['id'].isin(history['id'])]:
+            context.log.warning(f"Aucune donnée disponible pour {coin_id} sur le mois {yearMonth}")
         ax4.set_title(f"Évolution des prix sur le mois - {yearMonth}")
         ax4.set_xlabel("Date")
         ax4.set_ylabel("Prix en USD")
         ax4.legend()
         ax4.grid(True)
         
-        # Ajuster l'espacement entre les graphiques
-        plt.tight_layout()
+        # Ajuster l'espacement entre les graphiques (mise en page calculée une fois :
+        # pas de bbox_inches='tight', qui redessine la figure)
+        fig.tight_layout()
         
-
         # Sauvegarder le graphique
         file_path = f"crypto_pipeline/data/monthly_report_{month}.png"
-        plt.savefig(file_path, dpi=300, bbox_inches='tight')
-        plt.close()
+        # PNG à 100 DPI, encodé comme les autres graphiques (compression zlib rapide) :
+        # l'encodage à 300 DPI en compression maximale dominait le temps de génération du rapport
+        _save_png(fig, file_path, dpi=100)
         
         context.log.info(f"Rapport mensuel généré pour {month} et sauvegardé dans {file_path}")
         
         return top_coins, file_path
     except Exception as e:
         context.log.error(f"Erreur lors de la génération du rapport mensuel: {e}")
-        empty_df = pd.DataFrame(columns=['id', 'name', 'price', 'market_cap', 'price_change_percentage_24h'])
+        empty_df = EMPTY_TOP_COINS.copy()
         file_path = f"crypto_pipeline/data/monthly_report_error_{month}.txt"
         with open(file_path, 'w') as f:
             f.write(f"Erreur lors de la génération du rapport: {e}")
@@ -2,11 +2,12 @@
 Définitions Dagster pour notre pipeline de cryptomonnaies.
 """
 
-from dagster import Definitions, load_assets_from_modules
+from dagster import Definitions, load_assets_from_modules, multiprocess_executor
 import os
 
 from crypto_pipeline.resources.coingecko_resource import CoinGeckoResource
 from crypto_pipeline.resources.duckdb_resource import DuckDBResource
+from crypto_pipeline.resources.parquet_io_manager import ParquetIOManagerFactory
 from crypto_pipeline import assets, jobs, schedules, sensors
 
 # Chargement des assets depuis le module assets
@@ -16,10 +17,17 @@ all_assets = load_assets_from_modules([assets])
 resources = {
     "coingecko_resource": CoinGeckoResource(),
     "duckdb_resource": DuckDBResource(
-        database_path=os.environ.get("DUCKDB_PATH", "crypto_pipeline/data/crypto.duckdb")
+        database_path=os.environ.get("DUCKDB_PATH", "crypto_pipeline/data/crypto.duckdb"),
+        price_history_path=os.environ.get("PRICE_HISTORY_PATH", "crypto_pipeline/data/price_history"),
+    ),
+    "parquet_io_manager": ParquetIOManagerFactory(
+        base_path=os.environ.get("PARQUET_STORAGE_PATH", "crypto_pipeline/data/storage")
     ),
 }
 
+# Exécuteur multiprocessus : les étapes indépendantes d'un run s'exécutent en parallèle
+executor = multiprocess_executor.configured({"max_concurrent": 4})
+
 # Définition de l'application Dagster
 defs = Definitions(
     assets=all_assets,
@@ -43,4 +51,5 @@ defs = Definitions(
         sensors.visualization_files_sensor,
     ],
     resources=resources,
+    executor=executor,
 ) 
\ No newline at end of file
@@ -3,4 +3,5 @@ Module contenant les ressources Dagster pour notre pipeline.
 """
 
 from crypto_pipeline.resources.coingecko_resource import *  # noqa
-from crypto_pipeline.resources.duckdb_resource import *  # noqa 
\ No newline at end of file
+from crypto_pipeline.resources.duckdb_resource import *  # noqa 
+from crypto_pipeline.resources.parquet_io_manager import *  # noqa
\ No newline at end of file
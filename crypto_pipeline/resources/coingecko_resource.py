@@ -2,59 +2,233 @@
 Ressource pour l'API CoinGecko.
 """
 
+import json
 import requests
+import requests_cache
+import threading
 import time
-from dagster import ConfigurableResource, get_dagster_logger
-from typing import List, Dict, Any
+from collections import deque
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from dagster import ConfigurableResource, InitResourceContext, get_dagster_logger
+from pydantic import PrivateAttr
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+from typing import List, Dict, Any, Callable, Iterable, Iterator, Optional
+
+try:
+    import orjson
+except ImportError:  # orjson est facultatif : repli sur le module json standard
+    orjson = None
 
 logger = get_dagster_logger()
 
+# Délais (connexion, lecture) en secondes appliqués à chaque requête
+REQUEST_TIMEOUT = (5, 30)
+
+# Nombre maximal de résultats par page de /coins/markets
+MARKETS_PAGE_SIZE = 250
+
+# Durée d'un jour en millisecondes (unité des timestamps CoinGecko)
+MS_PER_DAY = 86_400_000
+
+def _daily_points(points: List[List[float]]) -> List[List[float]]:
+    """
+    Ne garde que le premier point de chaque jour UTC d'une série [timestamp_ms, valeur]
+    triée par date, comme l'échantillonnage interval=daily de /market_chart.
+    """
+    daily, last_day = [], None
+    for point in points:
+        day = int(point[0]) // MS_PER_DAY
+        if day != last_day:
+            daily.append(point)
+            last_day = day
+    return daily
+
+def _loads(content: bytes) -> Any:
+    """
+    Décode un corps de réponse JSON, avec orjson s'il est installé (décodage en C
+    directement depuis les octets, plus rapide que json).
+    """
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+# Codes HTTP transitoires pour lesquels la requête est retentée par urllib3
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+class _PacedRetry(Retry):
+    """
+    Politique Retry dont chaque nouvelle tentative attend aussi un créneau de
+    l'espacement des requêtes (wait_for_slot) : les tentatives faites par
+    l'adaptateur comptent dans la limite calls_per_minute.
+    """
+    def __init__(self, *args, wait_for_slot: Optional[Callable[[], None]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_for_slot = wait_for_slot
+    
+    def new(self, **kwargs) -> "_PacedRetry":
+        # urllib3 recrée l'objet à chaque tentative : le rappel doit être transmis
+        retry = super().new(**kwargs)
+        retry.wait_for_slot = self.wait_for_slot
+        return retry
+    
+    def sleep(self, response=None) -> None:
+        super().sleep(response)
+        if self.wait_for_slot is not None:
+            self.wait_for_slot()
+
+def _configure_session(session: requests.Session, retries: Retry) -> requests.Session:
+    """
+    Monte un pool de connexions HTTPS réutilisables, avec la politique de nouvelles
+    tentatives `retries`, et fixe les en-têtes communs.
+    """
+    session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retries))
+    session.headers.update({
+        "Accept-Encoding": "gzip, deflate",
+        "User-Agent": "crypto_pipeline/0.1",
+    })
+    return session
+
 class CoinGeckoResource(ConfigurableResource):
     """
     Ressource pour interagir avec l'API CoinGecko.
     """
     base_url: str = "https://api.coingecko.com/api/v3"
     rate_limit_delay: int = 2  # Attendre 2 secondes entre chaque requête
+    calls_per_minute: int = 30  # Nombre maximum de requêtes par minute glissante (0 : pas de limite)
     max_retries: int = 3  # Nombre maximum de tentatives en cas d'erreur
+    max_concurrent_requests: int = 4  # Nombre de requêtes simultanées vers l'API
+    cache_path: str = "crypto_pipeline/data/coingecko_cache"  # Cache disque (SQLite) des réponses peu volatiles
+    coin_list_cache_ttl: int = 86400  # Durée de validité en secondes de la liste des cryptomonnaies en cache
+    
+    _pacing_lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _next_request_at: float = PrivateAttr(default=0.0)
+    _request_times: deque = PrivateAttr(default_factory=deque)
+    _session_lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _session: Optional[requests.Session] = PrivateAttr(default=None)
+    _cached_session: Optional[requests_cache.CachedSession] = PrivateAttr(default=None)
+    _coin_list: Optional[List[Dict[str, Any]]] = PrivateAttr(default=None)
+    
+    def _wait_for_slot(self) -> None:
+        """
+        Espace le démarrage des requêtes de rate_limit_delay secondes et limite leur
+        nombre à calls_per_minute sur toute fenêtre de 60 secondes, y compris
+        lorsque plusieurs threads partagent la ressource.
+        """
+        with self._pacing_lock:
+            now = time.monotonic()
+            start_at = max(now, self._next_request_at)
+            if self.calls_per_minute > 0:
+                # Les calls_per_minute derniers démarrages réservés, dans l'ordre : la
+                # prochaine requête part au plus tôt 60 secondes après le plus ancien
+                request_times = self._request_times
+                if len(request_times) >= self.calls_per_minute:
+                    start_at = max(start_at, request_times[0] + 60)
+                request_times.append(start_at)
+                while len(request_times) > self.calls_per_minute:
+                    request_times.popleft()
+            self._next_request_at = start_at + self.rate_limit_delay
+        if start_at > now:
+            time.sleep(start_at - now)
+    
+    def _retries(self) -> Retry:
+        """
+        Politique de nouvelles tentatives appliquée par urllib3 : l'en-tête Retry-After
+        est respecté après un 429, sinon backoff exponentiel avec gigue.
+        
+        max_retries est le nombre total de tentatives, requête initiale comprise
+        (urllib3 ne compte que les nouvelles tentatives). Chaque nouvelle tentative
+        passe aussi par _wait_for_slot.
+        """
+        return _PacedRetry(
+            total=max(0, self.max_retries - 1),
+            backoff_factor=self.rate_limit_delay,
+            backoff_jitter=0.3,
+            status_forcelist=RETRY_STATUS_CODES,
+            allowed_methods=("GET",),
+            respect_retry_after_header=True,
+            wait_for_slot=self._wait_for_slot,
+        )
+    
+    def _get_session(self) -> requests.Session:
+        """
+        Session HTTP partagée : les connexions HTTPS sont réutilisées d'une requête à l'autre.
+        """
+        with self._session_lock:
+            if self._session is None:
+                self._session = _configure_session(requests.Session(), self._retries())
+            return self._session
+    
+    def _get_cached_session(self) -> requests_cache.CachedSession:
+        """
+        Session HTTP avec cache disque, réservée aux endpoints qui changent rarement.
+        Les données de marché, plus volatiles, ne passent pas par ce cache.
+        """
+        with self._session_lock:
+            if self._cached_session is None:
+                self._cached_session = _configure_session(requests_cache.CachedSession(
+                    cache_name=self.cache_path,
+                    backend="sqlite",
+                    expire_after=timedelta(seconds=self.coin_list_cache_ttl),
+                    allowable_methods=("GET",)
+                ), self._retries())
+            return self._cached_session
+    
+    def teardown_after_execution(self, context: InitResourceContext) -> None:
+        """
+        Ferme les connexions HTTP conservées par les sessions à la fin de l'exécution
+        et oublie la liste des cryptomonnaies gardée en mémoire.
+        """
+        self._coin_list = None
+        for session in (self._session, self._cached_session):
+            if session is not None:
+                session.close()
     
-    def _make_request(self, endpoint: str, params: dict = None) -> dict:
+    def _make_request(self, endpoint: str, params: dict = None, session: requests.Session = None) -> dict:
         """
         Effectue une requête HTTP avec gestion des erreurs et des limites de taux.
+        
+        Si une session avec cache est fournie et que la réponse y est encore valide,
+        elle est retournée sans attendre ni solliciter l'API. Une réponse expirée est
+        revalidée par une requête conditionnelle (If-None-Match / If-Modified-Since) :
+        si l'API répond 304, le corps déjà en cache est réutilisé.
         """
         url = f"{self.base_url}{endpoint}"
-        for attempt in range(self.max_retries):
-            try:
-                # Attendre avant chaque requête pour respecter les limites
-                time.sleep(self.rate_limit_delay)
-                
-                response = requests.get(url, params=params)
-                response.raise_for_status()
-                return response.json()
-            except requests.exceptions.HTTPError as e:
-                if e.response.status_code == 429:  # Too Many Requests
-                    if attempt < self.max_retries - 1:
-                        # Augmenter le délai d'attente à chaque tentative
-                        wait_time = (attempt + 1) * self.rate_limit_delay
-                        logger.warning(f"Rate limit atteint. Attente de {wait_time} secondes...")
-                        time.sleep(wait_time)
-                        continue
-                logger.error(f"Erreur HTTP lors de la requête: {e}")
-                raise
-            except requests.exceptions.RequestException as e:
-                if attempt < self.max_retries - 1:
-                    logger.warning(f"Erreur de requête. Nouvelle tentative dans {self.rate_limit_delay} secondes...")
-                    time.sleep(self.rate_limit_delay)
-                    continue
-                logger.error(f"Erreur lors de la requête: {e}")
-                raise
+        if isinstance(session, requests_cache.CachedSession):
+            cached = session.get(url, params=params, timeout=REQUEST_TIMEOUT, only_if_cached=True)
+            if cached.ok:
+                logger.info(f"Réponse de {endpoint} servie depuis le cache")
+                return _loads(cached.content)
+        
+        # Attendre avant chaque requête pour respecter les limites ; les nouvelles
+        # tentatives (429, erreurs 5xx et réseau) sont gérées par l'adaptateur urllib3
+        self._wait_for_slot()
+        try:
+            response = (session or self._get_session()).get(url, params=params, timeout=REQUEST_TIMEOUT)
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Erreur lors de la requête: {e}")
+            raise
+        if getattr(response, "revalidated", False):
+            logger.info(f"Réponse de {endpoint} inchangée (304), contenu en cache réutilisé")
+        
+        return _loads(response.content)
 
     def get_coin_list(self) -> List[Dict[str, Any]]:
         """
         Récupère la liste des cryptomonnaies disponibles.
+        
+        La liste est gardée en mémoire jusqu'à la fin de l'exécution : les appels
+        suivants dans le même processus ne relisent ni le cache disque ni l'API.
         """
+        if self._coin_list is not None:
+            return self._coin_list
         try:
             logger.info("Récupération de la liste des cryptomonnaies")
-            return self._make_request("/coins/list")
+            self._coin_list = self._make_request("/coins/list", session=self._get_cached_session())
+            return self._coin_list
         except Exception as e:
             logger.error(f"Erreur lors de la récupération de la liste des cryptomonnaies: {e}")
             raise
@@ -62,9 +236,12 @@ class CoinGeckoResource(ConfigurableResource):
     def get_coin_market_data(self, coin_ids: list, vs_currency: str = "usd", days: int = 1) -> List[Dict[str, Any]]:
         """
         Récupère les données de marché pour une liste de cryptomonnaies.
+        
+        Tous les identifiants sont envoyés dans un seul paramètre `ids` séparé par des
+        virgules : une seule requête couvre jusqu'à 250 cryptomonnaies (per_page).
         """
         try:
-            if isinstance(coin_ids, list):
+            if not isinstance(coin_ids, str):
                 coin_ids = ",".join(coin_ids)
             
             logger.info(f"Récupération des données de marché pour {coin_ids}")
@@ -72,14 +249,27 @@ class CoinGeckoResource(ConfigurableResource):
                 "ids": coin_ids,
                 "vs_currency": vs_currency,
                 "days": days,
-                "per_page": 250,
-                "page": 1
+                "per_page": MARKETS_PAGE_SIZE,
+                "page": 1,
+                "sparkline": "false"
             }
             return self._make_request("/coins/markets", params)
         except Exception as e:
             logger.error(f"Erreur lors de la récupération des données de marché: {e}")
             raise
 
+    def get_coin_market_data_paged(self, coin_ids: Iterable[str], vs_currency: str = "usd") -> Iterator[Dict[str, Any]]:
+        """
+        Récupère les données de marché par lots de MARKETS_PAGE_SIZE identifiants :
+        une requête /coins/markets par lot au lieu d'une par cryptomonnaie.
+        
+        Yields:
+            Les données de marché de chaque cryptomonnaie, lot par lot.
+        """
+        coin_ids = iter(coin_ids)
+        while batch := list(islice(coin_ids, MARKETS_PAGE_SIZE)):
+            yield from self.get_coin_market_data(batch, vs_currency=vs_currency)
+
     def get_coin_price_history(self, coin_id: str, vs_currency: str = "usd", days: int = 30) -> Dict[str, Any]:
         """
         Récupère l'historique des prix pour une cryptomonnaie.
@@ -94,4 +284,67 @@ class CoinGeckoResource(ConfigurableResource):
             return self._make_request(f"/coins/{coin_id}/market_chart", params)
         except Exception as e:
             logger.error(f"Erreur lors de la récupération de l'historique des prix: {e}")
-            raise 
\ No newline at end of file
+            raise
+
+    def get_coin_price_history_range(self, coin_id: str, from_ts: int, to_ts: int, vs_currency: str = "usd") -> Dict[str, Any]:
+        """
+        Récupère l'historique des prix d'une cryptomonnaie sur une fenêtre temporelle,
+        en une seule requête.
+        
+        Args:
+            coin_id: Identifiant de la cryptomonnaie.
+            from_ts: Début de la fenêtre (timestamp UNIX en secondes).
+            to_ts: Fin de la fenêtre (timestamp UNIX en secondes).
+            vs_currency: Devise de référence.
+        """
+        try:
+            logger.info(f"Récupération de l'historique des prix pour {coin_id} entre {from_ts} et {to_ts}")
+            params = {
+                "vs_currency": vs_currency,
+                "from": from_ts,
+                "to": to_ts
+            }
+            return self._make_request(f"/coins/{coin_id}/market_chart/range", params)
+        except Exception as e:
+            logger.error(f"Erreur lors de la récupération de l'historique des prix: {e}")
+            raise
+
+    def get_price_histories(
+        self,
+        coin_ids: List[str],
+        vs_currency: str = "usd",
+        days: int = 30,
+        from_ts: Optional[int] = None,
+        to_ts: Optional[int] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Récupère en parallèle l'historique des prix pour plusieurs cryptomonnaies.
+        
+        Si from_ts et to_ts sont fournis, la fenêtre est récupérée via /market_chart/range,
+        sinon les `days` derniers jours via /market_chart. L'endpoint /range retourne des
+        points toutes les 5 minutes ou toutes les heures selon la durée de la fenêtre : ils
+        sont ramenés au premier point de chaque jour, la granularité journalière de
+        /market_chart (interval=daily) attendue par le stockage et les rapports.
+        
+        Les requêtes sont exécutées dans un pool de max_concurrent_requests threads ;
+        leur démarrage reste espacé de rate_limit_delay secondes par _make_request.
+        Les cryptomonnaies en erreur sont journalisées et absentes du résultat.
+        
+        Returns:
+            Dictionnaire {coin_id: historique} dans l'ordre de coin_ids.
+        """
+        def fetch(coin_id):
+            try:
+                if from_ts is not None and to_ts is not None:
+                    history = self.get_coin_price_history_range(coin_id, from_ts, to_ts, vs_currency=vs_currency)
+                    return coin_id, {key: _daily_points(points) for key, points in history.items()}
+                return coin_id, self.get_coin_price_history(coin_id, vs_currency=vs_currency, days=days)
+            except Exception as e:
+                logger.error(f"Échec de la récupération de l'historique des prix pour {coin_id}: {e}")
+                return coin_id, None
+        
+        max_workers = max(1, min(self.max_concurrent_requests, len(coin_ids)))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(fetch, coin_ids))
+        
+        return {coin_id: history for coin_id, history in results if history is not None}
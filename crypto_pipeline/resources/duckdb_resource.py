@@ -2,48 +2,380 @@
 Ressource pour DuckDB.
 """
 
+import glob
+import hashlib
 import os
+import threading
+import urllib.parse
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 import duckdb
-from dagster import ConfigurableResource, get_dagster_logger
-from typing import List, Dict, Any
-from datetime import datetime
+from dagster import ConfigurableResource, InitResourceContext, get_dagster_logger
+from pydantic import PrivateAttr
+from typing import List, Dict, Any, Optional
+from datetime import date, datetime
 
 logger = get_dagster_logger()
 
+# Schémas Arrow des données échangées entre les assets d'extraction et de chargement
+COIN_LIST_SCHEMA = pa.schema([
+    ("id", pa.string()),
+    ("symbol", pa.string()),
+    ("name", pa.string()),
+])
+
+MARKET_DATA_SCHEMA = pa.schema([
+    ("id", pa.string()),
+    ("symbol", pa.string()),
+    ("name", pa.string()),
+    ("current_price", pa.float64()),
+    ("market_cap", pa.float64()),
+    ("total_volume", pa.float64()),
+    ("high_24h", pa.float64()),
+    ("low_24h", pa.float64()),
+    ("price_change_percentage_24h", pa.float64()),
+])
+
+def _empty_frame(dtypes: Dict[str, str]) -> pd.DataFrame:
+    """
+    Construit un DataFrame vide aux colonnes typées.
+    """
+    return pd.DataFrame({column: pd.Series(dtype=dtype) for column, dtype in dtypes.items()})
+
+# DataFrames vides retournés quand les données sont absentes ou en erreur. Ils sont
+# construits une seule fois : les appelants en reçoivent une copie avec .copy()
+TOP_COINS_DTYPES = {
+    "id": "object",
+    "name": "object",
+    "price": "float64",
+    "market_cap": "float64",
+    "price_change_percentage_24h": "float64",
+}
+
+EMPTY_TOP_COINS = _empty_frame(TOP_COINS_DTYPES)
+
+EMPTY_TOP_COINS_WITH_HISTORY = _empty_frame({
+    **TOP_COINS_DTYPES,
+    "rn": "int64",
+    "timestamp": "datetime64[ns]",
+    "hist_price": "float64",
+})
+
+EMPTY_PRICE_HISTORY = _empty_frame({
+    "timestamp": "datetime64[ns]",
+    "price": "float64",
+    "market_cap": "float64",
+    "total_volume": "float64",
+})
+
+# Table Arrow vide retournée par get_coin_price_history_arrow (les tables Arrow sont immuables)
+EMPTY_PRICE_HISTORY_TABLE = pa.table({
+    "timestamp": pa.array([], pa.timestamp("us")),
+    "price": pa.array([], pa.float64()),
+})
+
+def _digest(*buffers) -> str:
+    """
+    Empreinte BLAKE2 (stdlib) d'un contenu, utilisée pour détecter les données inchangées.
+    
+    Args:
+        buffers: Objets supportant le protocole buffer (bytes, tableaux NumPy, pa.Buffer).
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for buffer in buffers:
+        digest.update(buffer)
+    return digest.hexdigest()
+
+def _table_digest(table: pa.Table) -> str:
+    """
+    Empreinte d'une table Arrow, calculée sur sa sérialisation IPC.
+    """
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return _digest(sink.getvalue())
+
+def to_arrow_table(records, schema: pa.Schema) -> pa.Table:
+    """
+    Convertit une liste de dictionnaires en table Arrow, en ne conservant que les
+    colonnes du schéma. Une table Arrow est retournée telle quelle.
+    
+    La table est construite colonne par colonne, directement dans le type Arrow du
+    schéma, sans passer par un DataFrame pandas intermédiaire.
+    """
+    if isinstance(records, pa.Table):
+        return records
+    records = list(records)
+    return pa.Table.from_arrays(
+        [pa.array([record.get(field.name) for record in records], field.type) for field in schema],
+        schema=schema
+    )
+
 class DuckDBResource(ConfigurableResource):
     """
     Ressource pour interagir avec DuckDB.
     """
     database_path: str = "crypto_pipeline/data/crypto.duckdb"
+    price_history_path: str = "crypto_pipeline/data/price_history"  # Dataset Parquet de l'historique des prix
+    threads: Optional[int] = None  # Nombre de threads DuckDB (par défaut : tous les cœurs)
+    memory_limit: Optional[str] = None  # Limite mémoire DuckDB, par exemple "4GB" (par défaut : limite DuckDB)
+    
+    _tables_ready: bool = PrivateAttr(default=False)
+    _conn: Optional[duckdb.DuckDBPyConnection] = PrivateAttr(default=None)
+    _conn_lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
     
     def __post_init__(self):
         # Créer le répertoire de données s'il n'existe pas
         os.makedirs(os.path.dirname(self.database_path), exist_ok=True)
     
+    def _ensure_tables(self) -> None:
+        """
+        Crée les tables si ce n'est pas déjà fait pour cette instance.
+        
+        Appelée uniquement par les méthodes d'écriture (store_*) : les étapes qui ne
+        font que lire la base n'exécutent aucun DDL.
+        """
+        if not self._tables_ready:
+            os.makedirs(os.path.dirname(self.database_path) or ".", exist_ok=True)
+            self.create_tables()
+            self._migrate_price_history_table()
+            self._tables_ready = True
+    
+    def teardown_after_execution(self, context: InitResourceContext) -> None:
+        """
+        Ferme la connexion partagée à la fin de l'exécution.
+        """
+        with self._conn_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+    
     def _get_connection(self):
         """
-        Établit une connexion à la base de données DuckDB.
+        Retourne un curseur sur la connexion DuckDB du processus.
+        
+        La connexion est ouverte une seule fois (à la première utilisation) puis
+        partagée ; chaque appel reçoit son propre curseur, fermé en sortie du bloc
+        `with`, ce qui permet l'utilisation depuis plusieurs threads.
+        """
+        with self._conn_lock:
+            if self._conn is None:
+                self._conn = duckdb.connect(self.database_path)
+                # L'ordre d'insertion n'a pas d'importance pour nos tables : DuckDB peut
+                # paralléliser les insertions en masse
+                self._conn.execute("PRAGMA preserve_insertion_order=false")
+                if self.threads is not None:
+                    self._conn.execute(f"PRAGMA threads={int(self.threads)}")
+                if self.memory_limit is not None:
+                    self._conn.execute("SET memory_limit = ?", [self.memory_limit])
+            return self._conn.cursor()
+    
+    def _insert_arrow(self, conn, table: pa.Table, target: str, columns: str, select: str, key: str,
+                      params: Optional[List[Any]] = None) -> None:
+        """
+        Insère une table Arrow dans `target` en une seule requête INSERT ... SELECT.
+        
+        Les lignes déjà présentes (même clé primaire) sont mises à jour en place par
+        ON CONFLICT DO UPDATE, sans suppression puis réinsertion comme INSERT OR REPLACE.
+        
+        Args:
+            conn: Curseur DuckDB.
+            table: Table Arrow à insérer.
+            target: Table DuckDB de destination.
+            columns: Colonnes de destination, séparées par des virgules.
+            select: Expressions SELECT évaluées sur la table Arrow.
+            key: Colonnes de la clé primaire, séparées par des virgules.
+            params: Paramètres liés aux marqueurs `?` de `select`.
         """
-        return duckdb.connect(self.database_path)
+        key_columns = {column.strip() for column in key.split(",")}
+        updates = ", ".join(
+            f"{column} = EXCLUDED.{column}"
+            for column in (column.strip() for column in columns.split(","))
+            if column not in key_columns
+        )
+        
+        conn.register("_arrow_insert", table)
+        try:
+            conn.execute(f"""
+                INSERT INTO {target} ({columns})
+                SELECT {select} FROM _arrow_insert
+                ON CONFLICT ({key}) DO UPDATE SET {updates}
+            """, params)
+        finally:
+            conn.unregister("_arrow_insert")
+    
+    def _unchanged_payloads(self, conn, hashes: Dict[str, str]) -> set:
+        """
+        Retourne les clés dont l'empreinte est identique à celle des données déjà stockées.
+        
+        Args:
+            conn: Curseur DuckDB.
+            hashes: Dictionnaire {clé: empreinte} des données à stocker.
+        """
+        rows = conn.execute(
+            "SELECT key, hash FROM payload_hash WHERE key IN (SELECT UNNEST(?))",
+            [list(hashes)]
+        ).fetchall()
+        return {key for key, digest in rows if hashes.get(key) == digest}
+    
+    def _record_payload_hashes(self, conn, hashes: Dict[str, str]) -> None:
+        """
+        Enregistre les empreintes des données qui viennent d'être stockées.
+        """
+        self._insert_arrow(
+            conn, pa.table({"key": list(hashes), "hash": list(hashes.values())}), "payload_hash",
+            columns="key, hash, updated_at",
+            select="key, hash, CURRENT_TIMESTAMP",
+            key="key"
+        )
+    
+    def _price_history_key(self, coin_id: str) -> str:
+        """
+        Clé de l'empreinte d'un historique, propre au dataset Parquet dans lequel il est écrit.
+        """
+        return f"price_history:{os.path.abspath(self.price_history_path)}:{coin_id}"
+    
+    def _price_partition_dir(self, day, coin_id: str) -> str:
+        """
+        Répertoire de la partition dt=/id= d'un jour et d'une cryptomonnaie dans le dataset Parquet.
+        """
+        # Valeurs de partition encodées comme par pyarrow (segment_encoding="uri")
+        return os.path.join(self.price_history_path, f"dt={day}", f"id={urllib.parse.quote(coin_id, safe='')}")
+    
+    def _price_history_stored(self, conn, coin_id: str, price_points: np.ndarray) -> bool:
+        """
+        Indique si tous les points d'un historique sont présents dans le dataset Parquet.
+        
+        La présence des répertoires dt=/id= ne suffit pas : une partition tronquée par
+        une écriture antérieure existe toujours. Les timestamps stockés dans les
+        partitions de l'historique sont donc comparés à ceux des données à stocker.
+        
+        Args:
+            conn: Curseur DuckDB.
+            coin_id: Identifiant de la cryptomonnaie.
+            price_points: Tableau (n, 2) des paires [timestamp_ms, prix].
+        """
+        timestamps = np.unique(price_points[:, 0].astype(np.int64))
+        days = np.unique(timestamps.astype("datetime64[ms]").astype("datetime64[D]"))
+        files = [
+            path
+            for day in days
+            for path in glob.glob(os.path.join(self._price_partition_dir(day, coin_id), "*.parquet"))
+        ]
+        if not files:
+            return False
+        
+        conn.register("_payload_timestamps", pa.table({"timestamp": pa.array(timestamps, pa.timestamp("ms"))}))
+        try:
+            stored, = conn.execute(
+                """
+                SELECT COUNT(DISTINCT e.timestamp)
+                FROM read_parquet(?, hive_partitioning = true, hive_types = {'dt': DATE, 'id': VARCHAR}) e
+                SEMI JOIN _payload_timestamps p ON e.timestamp = p.timestamp
+                """,
+                [files]
+            ).fetchone()
+        except duckdb.IOException:
+            # Fichier supprimé entre le listage et la lecture
+            return False
+        finally:
+            conn.unregister("_payload_timestamps")
+        return stored == len(timestamps)
+    
+    def _merge_existing_partitions(self, table: pa.Table) -> pa.Table:
+        """
+        Complète une table d'historique avec les lignes déjà stockées dans les partitions
+        dt=/id= qu'elle touche, pour que leur réécriture ne perde aucun point.
+        
+        Les lignes existantes de même (id, timestamp) sont remplacées par les nouvelles.
+        
+        Args:
+            table: Table Arrow (id, timestamp, price, market_cap, total_volume, dt) à écrire.
+        """
+        partitions = table.select(["dt", "id"]).group_by(["dt", "id"]).aggregate([])
+        files = [
+            path
+            for day, coin_id in zip(partitions["dt"].to_pylist(), partitions["id"].to_pylist())
+            for path in glob.glob(os.path.join(self._price_partition_dir(day, coin_id), "*.parquet"))
+        ]
+        if not files:
+            return table
+        
+        with self._get_connection() as conn:
+            conn.register("_new_price_history", table)
+            try:
+                existing = pa.table(conn.execute(
+                    """
+                    SELECT e.id, e.timestamp, e.price, e.market_cap, e.total_volume, e.dt
+                    FROM read_parquet(?, hive_partitioning = true, hive_types = {'dt': DATE, 'id': VARCHAR}) e
+                    ANTI JOIN _new_price_history n ON e.id = n.id AND e.timestamp = n.timestamp
+                    """,
+                    [files]
+                ).arrow())
+            finally:
+                conn.unregister("_new_price_history")
+        return pa.concat_tables([table, existing.cast(table.schema)])
+    
+    def _write_price_history(self, table: pa.Table) -> None:
+        """
+        Écrit une table d'historique (id, timestamp, price, market_cap, total_volume) dans
+        le dataset Parquet partitionné (dt=YYYY-MM-DD/id=<coin>/).
+        
+        Les partitions touchées sont réécrites avec leurs lignes existantes et les
+        nouvelles : une fenêtre qui ne couvre qu'une partie d'un jour ne tronque pas ce jour.
+        """
+        # Colonne de partition journalière (date UTC) dérivée du timestamp
+        table = table.append_column("dt", pc.cast(table["timestamp"], pa.date32()))
+        table = self._merge_existing_partitions(table)
+        
+        os.makedirs(self.price_history_path, exist_ok=True)
+        pq.write_to_dataset(
+            table,
+            root_path=self.price_history_path,
+            partition_cols=["dt", "id"],
+            existing_data_behavior="delete_matching",
+        )
+    
+    def _migrate_price_history_table(self) -> None:
+        """
+        Copie une fois dans le dataset Parquet les lignes de l'ancienne table
+        crypto_price_history (avant le passage au Parquet), puis supprime la table.
+        """
+        try:
+            with self._get_connection() as conn:
+                legacy = pa.table(conn.execute("""
+                    SELECT id, CAST(timestamp AS TIMESTAMP_MS) AS timestamp, CAST(price AS DOUBLE) AS price,
+                        CAST(market_cap AS DOUBLE) AS market_cap, CAST(total_volume AS DOUBLE) AS total_volume
+                    FROM crypto_price_history
+                """).arrow())
+        except duckdb.CatalogException:
+            return
+        
+        if legacy.num_rows > 0:
+            self._write_price_history(legacy)
+        with self._get_connection() as conn:
+            conn.execute("DROP TABLE crypto_price_history")
+        logger.info(f"{legacy.num_rows} entrées de l'ancienne table crypto_price_history copiées dans {self.price_history_path}")
     
     def create_tables(self):
         """
         Crée les tables nécessaires dans la base de données.
         """
         with self._get_connection() as conn:
-            # Table pour les métadonnées des cryptomonnaies
+            # Toutes les définitions sont soumises en une seule requête multi-instructions
             conn.execute("""
+                -- Table pour les métadonnées des cryptomonnaies
                 CREATE TABLE IF NOT EXISTS crypto_metadata (
                     id VARCHAR PRIMARY KEY,
                     symbol VARCHAR,
                     name VARCHAR,
                     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            
-            # Table pour les données de marché des cryptomonnaies
-            conn.execute("""
+                );
+                
+                -- Table pour les données de marché des cryptomonnaies
                 CREATE TABLE IF NOT EXISTS crypto_market_data (
                     id VARCHAR,
                     date DATE,
@@ -55,20 +387,19 @@ class DuckDBResource(ConfigurableResource):
                     price_change_percentage_24h DECIMAL(10, 2),
                     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     PRIMARY KEY (id, date)
-                )
-            """)
-            
-            # Table pour l'historique des prix
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS crypto_price_history (
-                    id VARCHAR,
-                    timestamp TIMESTAMP,
-                    price DECIMAL(18, 8),
-                    market_cap DECIMAL(24, 8),
-                    total_volume DECIMAL(24, 8),
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    PRIMARY KEY (id, timestamp)
-                )
+                );
+                
+                -- Empreintes des dernières données stockées, pour ignorer les données inchangées
+                CREATE TABLE IF NOT EXISTS payload_hash (
+                    key VARCHAR PRIMARY KEY,
+                    hash VARCHAR,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                );
+                
+                -- Vue des données de marché de la dernière date disponible
+                CREATE OR REPLACE VIEW latest_market_data AS
+                SELECT * FROM crypto_market_data
+                WHERE date = (SELECT MAX(date) FROM crypto_market_data);
             """)
             
             logger.info("Tables créées avec succès")
@@ -78,152 +409,151 @@ class DuckDBResource(ConfigurableResource):
         Stocke la liste des cryptomonnaies dans la base de données.
         
         Args:
-            coins_data: Liste des cryptomonnaies à stocker.
+            coins_data: Table Arrow (ou liste de dictionnaires) des cryptomonnaies à stocker.
         """
-        df = pd.DataFrame(coins_data)
+        table = to_arrow_table(coins_data, COIN_LIST_SCHEMA)
+        
+        self._ensure_tables()
         
         with self._get_connection() as conn:
-            # Vérifier si la table existe et la créer si nécessaire
-            conn.execute("CREATE TABLE IF NOT EXISTS crypto_metadata (id VARCHAR PRIMARY KEY, symbol VARCHAR, name VARCHAR, updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)")
-            
-            # Conversion du DataFrame en table temporaire
-            conn.register("temp_coins", df)
-            
-            # Insertion des données avec gestion des doublons
-            conn.execute("""
-                INSERT OR REPLACE INTO crypto_metadata (id, symbol, name, updated_at)
-                SELECT id, symbol, name, CURRENT_TIMESTAMP FROM temp_coins
-            """)
+            # Insertion en masse de la table Arrow avec gestion des doublons
+            self._insert_arrow(
+                conn, table, "crypto_metadata",
+                columns="id, symbol, name, updated_at",
+                select="id, symbol, name, CURRENT_TIMESTAMP",
+                key="id"
+            )
             
-            logger.info(f"{len(df)} cryptomonnaies stockées dans la base de données")
+            logger.info(f"{table.num_rows} cryptomonnaies stockées dans la base de données")
     
-    def store_market_data(self, market_data):
+    def store_market_data(self, market_data, partition_date: Optional[date] = None):
         """
         Stocke les données de marché dans la base de données.
         
         Args:
-            market_data: Données de marché à stocker.
+            market_data: Table Arrow (ou liste de dictionnaires) des données de marché à stocker.
+            partition_date: Date à laquelle rattacher les données (date du jour par défaut).
         """
-        if not market_data:
+        table = to_arrow_table(market_data or [], MARKET_DATA_SCHEMA)
+        if table.num_rows == 0:
             logger.warning("Aucune donnée de marché à stocker")
             return
-            
-        df = pd.DataFrame(market_data)
-        
-        # Formatage des colonnes pour correspondre à notre schéma
-        df = df.rename(columns={
-            'id': 'id',
-            'current_price': 'price',
-            'market_cap': 'market_cap',
-            'total_volume': 'total_volume',
-            'high_24h': 'high_24h',
-            'low_24h': 'low_24h',
-            'price_change_percentage_24h': 'price_change_percentage_24h'
-        })
         
-        # Ajouter la date du jour
-        df['date'] = pd.Timestamp.now().date()
+        self._ensure_tables()
         
-        # Sélectionner uniquement les colonnes nécessaires
-        cols = ['id', 'date', 'price', 'market_cap', 'total_volume', 
-                'high_24h', 'low_24h', 'price_change_percentage_24h']
-        df = df[cols]
+        # Les données identiques à celles déjà stockées pour cette date ne sont pas réécrites
+        hashes = {f"market_data:{partition_date or date.today()}": _table_digest(table)}
         
         with self._get_connection() as conn:
-            # Vérifier si la table existe et la créer si nécessaire
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS crypto_market_data (
-                    id VARCHAR,
-                    date DATE,
-                    price DECIMAL(18, 8),
-                    market_cap DECIMAL(24, 8),
-                    total_volume DECIMAL(24, 8),
-                    high_24h DECIMAL(18, 8),
-                    low_24h DECIMAL(18, 8),
-                    price_change_percentage_24h DECIMAL(10, 2),
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    PRIMARY KEY (id, date)
-                )
-            """)
+            if self._unchanged_payloads(conn, hashes):
+                logger.info("Données de marché inchangées, stockage ignoré")
+                return
             
-            # Conversion du DataFrame en table temporaire
-            conn.register("temp_market_data", df)
+            # Insertion en masse avec gestion des doublons (current_price -> price, date de partition)
+            self._insert_arrow(
+                conn, table, "crypto_market_data",
+                columns="id, date, price, market_cap, total_volume, high_24h, low_24h, price_change_percentage_24h, updated_at",
+                select="id, COALESCE(CAST(? AS DATE), CURRENT_DATE), current_price, market_cap, total_volume, "
+                       "high_24h, low_24h, price_change_percentage_24h, CURRENT_TIMESTAMP",
+                key="id, date",
+                params=[partition_date]
+            )
+            self._record_payload_hashes(conn, hashes)
             
-            # Insertion des données avec gestion des doublons
-            conn.execute("""
-                INSERT OR REPLACE INTO crypto_market_data 
-                    (id, date, price, market_cap, total_volume, high_24h, low_24h, price_change_percentage_24h, updated_at)
-                SELECT 
-                    id, date, price, market_cap, total_volume, high_24h, low_24h, price_change_percentage_24h, 
-                    CURRENT_TIMESTAMP
-                FROM temp_market_data
-            """)
-            
-            logger.info(f"{len(df)} entrées de données de marché stockées dans la base de données")
+            logger.info(f"{table.num_rows} entrées de données de marché stockées dans la base de données")
     
     def store_price_history(self, coin_id, price_history):
         """
-        Stocke l'historique des prix dans la base de données.
+        Stocke l'historique des prix d'une cryptomonnaie dans la base de données.
         
         Args:
             coin_id: Identifiant de la cryptomonnaie.
             price_history: Historique des prix à stocker.
         """
-        if not price_history or not price_history.get('prices'):
-            logger.warning(f"Aucun historique de prix à stocker pour {coin_id}")
-            return
+        self.store_price_histories([{"coin_id": coin_id, "history": price_history}])
+    
+    def store_price_histories(self, price_histories):
+        """
+        Stocke l'historique des prix de plusieurs cryptomonnaies en une seule insertion.
+        
+        Args:
+            price_histories: Liste de dictionnaires {"coin_id": ..., "history": ...}.
+        """
+        coins = []
+        
+        for coin_data in price_histories:
+            coin_id = coin_data["coin_id"]
+            price_history = coin_data["history"]
             
-        # Préparation des données de prix
-        prices = price_history.get('prices', [])
-        market_caps = price_history.get('market_caps', [])
-        total_volumes = price_history.get('total_volumes', [])
-        
-        # Vérifier que les listes ont la même longueur
-        if len(prices) != len(market_caps) or len(prices) != len(total_volumes):
-            logger.error("Les données d'historique n'ont pas la même longueur")
-            return
+            if not price_history or not price_history.get('prices'):
+                logger.warning(f"Aucun historique de prix à stocker pour {coin_id}")
+                continue
+                
+            # Préparation des données de prix
+            coin_prices = price_history.get('prices', [])
+            coin_market_caps = price_history.get('market_caps', [])
+            coin_total_volumes = price_history.get('total_volumes', [])
+            
+            # Vérifier que les listes ont la même longueur
+            if len(coin_prices) != len(coin_market_caps) or len(coin_prices) != len(coin_total_volumes):
+                logger.error(f"Les données d'historique de {coin_id} n'ont pas la même longueur")
+                continue
             
-        # Créer des DataFrames pour chaque type de données
-        df_prices = pd.DataFrame(prices, columns=['timestamp', 'price'])
-        df_market_caps = pd.DataFrame(market_caps, columns=['timestamp', 'market_cap'])
-        df_total_volumes = pd.DataFrame(total_volumes, columns=['timestamp', 'total_volume'])
+            # Conversion vectorisée des paires [timestamp, valeur] en tableaux (n, 2)
+            coins.append((
+                coin_id,
+                np.asarray(coin_prices, dtype=np.float64).reshape(-1, 2),
+                np.asarray(coin_market_caps, dtype=np.float64).reshape(-1, 2),
+                np.asarray(coin_total_volumes, dtype=np.float64).reshape(-1, 2),
+            ))
         
-        # Convertir les timestamps en datetime
-        df_prices['timestamp'] = pd.to_datetime(df_prices['timestamp'], unit='ms')
+        if not coins:
+            logger.warning("Aucun historique de prix à stocker")
+            return
+        
+        # Les historiques identiques à ceux déjà stockés dans ce dataset ne sont pas réécrits,
+        # tant que tous leurs points sont toujours présents sur disque (dataset supprimé,
+        # déplacé ou partition tronquée : l'empreinte enregistrée dans DuckDB ne suffit pas)
+        keys = [self._price_history_key(coin[0]) for coin in coins]
+        hashes = {key: _digest(*coin[1:]) for key, coin in zip(keys, coins)}
+        self._ensure_tables()
+        with self._get_connection() as conn:
+            unchanged = self._unchanged_payloads(conn, hashes)
+            unchanged = {
+                key for key, coin in zip(keys, coins)
+                if key in unchanged and self._price_history_stored(conn, coin[0], coin[1])
+            }
+        if unchanged:
+            logger.info(f"Historique inchangé pour {len(unchanged)} cryptomonnaies, stockage ignoré")
+            coins = [coin for key, coin in zip(keys, coins) if key not in unchanged]
+            if not coins:
+                return
         
-        # Fusionner les DataFrames
-        df = df_prices.copy()
-        df['market_cap'] = df_market_caps['market_cap']
-        df['total_volume'] = df_total_volumes['total_volume']
-        df['id'] = coin_id
+        ids, timestamps, prices, market_caps, total_volumes = [], [], [], [], []
+        for coin_id, price_points, market_cap_points, total_volume_points in coins:
+            ids.extend([coin_id] * len(price_points))
+            timestamps.append(price_points[:, 0])
+            prices.append(price_points[:, 1])
+            market_caps.append(market_cap_points[:, 1])
+            total_volumes.append(total_volume_points[:, 1])
         
+        # Table Arrow unique pour toutes les cryptomonnaies (timestamps en millisecondes)
+        table = pa.table({
+            "id": pa.array(ids, pa.string()),
+            "timestamp": pa.array(np.concatenate(timestamps).astype(np.int64), pa.timestamp("ms")),
+            "price": pa.array(np.concatenate(prices)),
+            "market_cap": pa.array(np.concatenate(market_caps)),
+            "total_volume": pa.array(np.concatenate(total_volumes)),
+        })
+        
+        # Écriture en dataset Parquet partitionné, fusionnée avec les partitions existantes
+        self._write_price_history(table)
         with self._get_connection() as conn:
-            # Vérifier si la table existe et la créer si nécessaire
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS crypto_price_history (
-                    id VARCHAR,
-                    timestamp TIMESTAMP,
-                    price DECIMAL(18, 8),
-                    market_cap DECIMAL(24, 8),
-                    total_volume DECIMAL(24, 8),
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    PRIMARY KEY (id, timestamp)
-                )
-            """)
-            
-            # Conversion du DataFrame en table temporaire
-            conn.register("temp_price_history", df)
-            
-            # Insertion des données avec gestion des doublons
-            conn.execute("""
-                INSERT OR REPLACE INTO crypto_price_history 
-                    (id, timestamp, price, market_cap, total_volume, updated_at)
-                SELECT 
-                    id, timestamp, price, market_cap, total_volume, CURRENT_TIMESTAMP
-                FROM temp_price_history
-            """)
-            
-            logger.info(f"{len(df)} entrées d'historique de prix stockées pour {coin_id}")
+            self._record_payload_hashes(conn, {
+                key: digest for key, digest in hashes.items() if key not in unchanged
+            })
+        
+        logger.info(f"{table.num_rows} entrées d'historique de prix stockées dans {self.price_history_path}")
     
     def get_top_coins(self, limit=10):
         """
@@ -235,35 +565,87 @@ class DuckDBResource(ConfigurableResource):
         Returns:
             DataFrame pandas contenant les résultats.
         """
-        with self._get_connection() as conn:
-            # Vérifier si les tables existent
-            tables_query = conn.execute("SELECT name FROM sqlite_master WHERE type='table'").fetchdf()
-            tables = tables_query['name'].tolist() if not tables_query.empty else []
-            
-            # Si les tables nécessaires n'existent pas, retourner un DataFrame vide
-            if 'crypto_market_data' not in tables or 'crypto_metadata' not in tables:
-                logger.warning("Les tables crypto_market_data ou crypto_metadata n'existent pas encore")
-                return pd.DataFrame(columns=['id', 'name', 'price', 'market_cap', 'price_change_percentage_24h'])
-                
-            # Vérifier si les tables contiennent des données
-            count = conn.execute("SELECT COUNT(*) FROM crypto_market_data").fetchone()[0]
-            if count == 0:
-                logger.warning("La table crypto_market_data est vide")
-                return pd.DataFrame(columns=['id', 'name', 'price', 'market_cap', 'price_change_percentage_24h'])
-                
-            try:
-                result = conn.execute(f"""
+        # Une seule requête : l'absence des tables est détectée par l'erreur de catalogue
+        try:
+            with self._get_connection() as conn:
+                result = conn.execute("""
                     SELECT m.id, meta.name, m.price, m.market_cap, m.price_change_percentage_24h
-                    FROM crypto_market_data m
+                    FROM latest_market_data m
                     JOIN crypto_metadata meta ON m.id = meta.id
-                    WHERE m.date = (SELECT MAX(date) FROM crypto_market_data)
                     ORDER BY m.market_cap DESC
-                    LIMIT {limit}
-                """).fetchdf()
-                return result
-            except Exception as e:
-                logger.error(f"Erreur lors de la récupération des top coins : {e}")
-                return pd.DataFrame(columns=['id', 'name', 'price', 'market_cap', 'price_change_percentage_24h'])
+                    LIMIT ?
+                """, [limit]).fetchdf()
+        except duckdb.CatalogException:
+            logger.warning("Les tables crypto_market_data ou crypto_metadata n'existent pas encore")
+            return EMPTY_TOP_COINS.copy()
+        except Exception as e:
+            logger.error(f"Erreur lors de la récupération des top coins : {e}")
+            return EMPTY_TOP_COINS.copy()
+        
+        # Table vide : la requête principale ne retourne aucune ligne
+        if result.empty:
+            logger.warning("La table crypto_market_data est vide")
+        return result
+    
+    def get_top_coins_with_history(self, limit, start_date, end_date):
+        """
+        Récupère les cryptomonnaies les plus importantes par capitalisation et leur
+        historique de prix sur une période, en une seule requête.
+        
+        Args:
+            limit: Nombre de cryptomonnaies à récupérer.
+            start_date: Début de la période (inclus).
+            end_date: Fin de la période (exclue).
+        
+        Returns:
+            DataFrame pandas avec une ligne par point d'historique (colonnes de
+            get_top_coins, plus rn, timestamp et hist_price). Une cryptomonnaie sans
+            historique sur la période apparaît une fois avec timestamp et hist_price vides.
+        """
+        try:
+            with self._get_connection() as conn:
+                return conn.execute(
+                    """
+                    WITH top AS (
+                        SELECT m.id, meta.name, m.price, m.market_cap, m.price_change_percentage_24h,
+                            ROW_NUMBER() OVER (ORDER BY m.market_cap DESC) AS rn
+                        FROM latest_market_data m
+                        JOIN crypto_metadata meta ON m.id = meta.id
+                        QUALIFY rn <= ?
+                    ),
+                    history AS (
+                        SELECT id, timestamp, price AS hist_price
+                        FROM read_parquet(?, hive_partitioning = true)
+                        WHERE dt >= ? AND dt < ?
+                        AND id IN (SELECT id FROM top)
+                    )
+                    SELECT t.*, h.timestamp, h.hist_price
+                    FROM top t
+                    LEFT JOIN history h ON t.id = h.id
+                    ORDER BY t.rn, h.timestamp
+                    """,
+                    [limit, self._price_history_glob(), start_date, end_date]
+                ).fetchdf()
+        except duckdb.IOException:
+            # Pas encore d'historique : retourner les top coins sans points d'historique
+            logger.warning("L'historique des prix n'existe pas encore")
+            top_coins = self.get_top_coins(limit)
+            top_coins['rn'] = range(1, len(top_coins) + 1)
+            top_coins['timestamp'] = pd.NaT
+            top_coins['hist_price'] = float('nan')
+            return top_coins
+        except duckdb.CatalogException:
+            logger.warning("Les tables crypto_market_data ou crypto_metadata n'existent pas encore")
+            return EMPTY_TOP_COINS_WITH_HISTORY.copy()
+        except Exception as e:
+            logger.error(f"Erreur lors de la récupération des top coins et de leur historique : {e}")
+            return EMPTY_TOP_COINS_WITH_HISTORY.copy()
+    
+    def _price_history_glob(self) -> str:
+        """
+        Motif des fichiers Parquet de l'historique des prix, lu par read_parquet.
+        """
+        return os.path.join(self.price_history_path, "**", "*.parquet")
     
     def get_price_history_for_coin(self, coin_id, days=30):
         """
@@ -276,78 +658,89 @@ class DuckDBResource(ConfigurableResource):
         Returns:
             DataFrame pandas contenant les résultats.
         """
-        with self._get_connection() as conn:
-            # Vérifier si les tables existent
-            tables_query = conn.execute("SELECT name FROM sqlite_master WHERE type='table'").fetchdf()
-            tables = tables_query['name'].tolist() if not tables_query.empty else []
-            
-            # Si la table nécessaire n'existe pas, retourner un DataFrame vide
-            if 'crypto_price_history' not in tables:
-                logger.warning("La table crypto_price_history n'existe pas encore")
-                return pd.DataFrame(columns=['timestamp', 'price', 'market_cap', 'total_volume'])
-                
-            # Vérifier si la table contient des données pour cette crypto
-            count = conn.execute(f"SELECT COUNT(*) FROM crypto_price_history WHERE id = '{coin_id}'").fetchone()[0]
-            if count == 0:
-                logger.warning(f"Pas de données d'historique pour {coin_id}")
-                return pd.DataFrame(columns=['timestamp', 'price', 'market_cap', 'total_volume'])
-                
-            try:
-                result = conn.execute(f"""
+        try:
+            with self._get_connection() as conn:
+                # Les filtres sur id et dt élaguent les partitions Parquet lues
+                result = conn.execute(
+                    """
                     SELECT timestamp, price, market_cap, total_volume
-                    FROM crypto_price_history
-                    WHERE id = '{coin_id}'
-                    AND timestamp >= CURRENT_DATE - INTERVAL '{days} days'
+                    FROM read_parquet(?, hive_partitioning = true)
+                    WHERE id = ?
+                    AND dt >= CURRENT_DATE - CAST(? AS INTEGER)
                     ORDER BY timestamp
-                """).fetchdf()
-                return result
-            except Exception as e:
-                logger.error(f"Erreur lors de la récupération de l'historique des prix pour {coin_id} : {e}")
-                return pd.DataFrame(columns=['timestamp', 'price', 'market_cap', 'total_volume'])
+                    """,
+                    [self._price_history_glob(), coin_id, days]
+                ).fetchdf()
+        except duckdb.IOException:
+            logger.warning("L'historique des prix n'existe pas encore")
+            return EMPTY_PRICE_HISTORY.copy()
+        except Exception as e:
+            logger.error(f"Erreur lors de la récupération de l'historique des prix pour {coin_id} : {e}")
+            return EMPTY_PRICE_HISTORY.copy()
+        
+        if result.empty:
+            logger.warning(f"Pas de données d'historique pour {coin_id}")
+        return result
     
-    def get_coin_price_history(self, coin_id: str) -> pd.DataFrame:
+    def get_coin_price_history_arrow(self, coin_id: str, start=None, end=None) -> pa.Table:
         """
-        Récupère l'historique des prix pour une cryptomonnaie.
+        Récupère l'historique des prix pour une cryptomonnaie sous forme de table Arrow,
+        sans conversion en pandas.
         
         Args:
             coin_id: Identifiant de la cryptomonnaie.
+            start: Début de la période (inclus, facultatif).
+            end: Fin de la période (exclue, facultative).
         
         Returns:
-            DataFrame pandas contenant les résultats.
+            Table Arrow (timestamp, price) triée par timestamp.
         """
+        # Le filtrage par période est fait dans la requête plutôt qu'en pandas
+        conditions = ["id = ?"]
+        params = [self._price_history_glob(), coin_id]
+        if start is not None:
+            conditions.append("timestamp >= ?")
+            params.append(pd.Timestamp(start).to_pydatetime())
+        if end is not None:
+            conditions.append("timestamp < ?")
+            params.append(pd.Timestamp(end).to_pydatetime())
+        
         try:
             with self._get_connection() as conn:
-                # Vérifier si la table existe
-                tables = conn.execute("SELECT table_name FROM duckdb_tables()").fetchall()
-                table_names = [t[0] for t in tables]
-                
-                if 'crypto_price_history' not in table_names:
-                    logger.warning("La table crypto_price_history n'existe pas encore")
-                    return pd.DataFrame(columns=['timestamp', 'price', 'market_cap', 'total_volume'])
-                    
-                # Vérifier si la table contient des données pour cette crypto
-                count = conn.execute(
-                    "SELECT COUNT(*) FROM crypto_price_history WHERE id = ?",
-                    (coin_id,)
-                ).fetchone()[0]
-                
-                if count == 0:
-                    logger.warning(f"Pas de données d'historique pour {coin_id}")
-                    return pd.DataFrame(columns=['timestamp', 'price', 'market_cap', 'total_volume'])
-                    
-                # Récupérer l'historique des prix
-                result = conn.execute(
-                    """
+                # Récupérer l'historique des prix (seules les partitions id=<coin_id> sont lues)
+                result = pa.table(conn.execute(
+                    f"""
                     SELECT timestamp, price
-                    FROM crypto_price_history
-                    WHERE id = ?
+                    FROM read_parquet(?, hive_partitioning = true)
+                    WHERE {" AND ".join(conditions)}
                     ORDER BY timestamp ASC
                     """,
-                    (coin_id,)
-                ).df()
-                
-                return result
-                
+                    params
+                ).arrow())
+        except duckdb.IOException:
+            logger.warning("L'historique des prix n'existe pas encore")
+            return EMPTY_PRICE_HISTORY_TABLE
         except Exception as e:
             logger.error(f"Erreur lors de la récupération de l'historique des prix pour {coin_id} : {e}")
-            return pd.DataFrame(columns=['timestamp', 'price', 'market_cap', 'total_volume'])
\ No newline at end of file
+            return EMPTY_PRICE_HISTORY_TABLE
+        
+        if result.num_rows == 0:
+            logger.warning(f"Pas de données d'historique pour {coin_id}")
+        return result
+    
+    def get_coin_price_history(self, coin_id: str, start=None, end=None) -> pd.DataFrame:
+        """
+        Récupère l'historique des prix pour une cryptomonnaie.
+        
+        Args:
+            coin_id: Identifiant de la cryptomonnaie.
+            start: Début de la période (inclus, facultatif).
+            end: Fin de la période (exclue, facultative).
+        
+        Returns:
+            DataFrame pandas contenant les résultats.
+        """
+        result = self.get_coin_price_history_arrow(coin_id, start, end)
+        if result.num_rows == 0:
+            return EMPTY_PRICE_HISTORY.copy()
+        return result.to_pandas()
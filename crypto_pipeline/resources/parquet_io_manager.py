@@ -0,0 +1,38 @@
+"""
+IO manager Parquet pour les assets produisant des tables Arrow.
+"""
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from dagster import (
+    ConfigurableIOManagerFactory,
+    InputContext,
+    OutputContext,
+    UPathIOManager,
+)
+from upath import UPath
+
+
+class ParquetIOManager(UPathIOManager):
+    """
+    Sérialise les tables Arrow en fichiers Parquet (une par partition) au lieu de pickle.
+    """
+    extension: str = ".parquet"
+
+    def dump_to_path(self, context: OutputContext, obj: pa.Table, path: UPath) -> None:
+        with path.open("wb") as f:
+            pq.write_table(obj, f)
+
+    def load_from_path(self, context: InputContext, path: UPath) -> pa.Table:
+        with path.open("rb") as f:
+            return pq.read_table(f)
+
+
+class ParquetIOManagerFactory(ConfigurableIOManagerFactory):
+    """
+    Ressource configurable créant le ParquetIOManager.
+    """
+    base_path: str = "crypto_pipeline/data/storage"
+
+    def create_io_manager(self, context) -> ParquetIOManager:
+        return ParquetIOManager(base_path=UPath(self.base_path))
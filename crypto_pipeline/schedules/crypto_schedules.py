@@ -2,16 +2,18 @@
 Schedules Dagster pour notre pipeline de cryptomonnaies.
 """
 
+from datetime import date, datetime, timedelta, timezone
+from typing import Callable
 from dagster import (
     schedule,
     ScheduleDefinition,
-    DailyPartitionsDefinition,
-    MonthlyPartitionsDefinition,
+    ScheduleEvaluationContext,
+    DefaultScheduleStatus,
     AssetSelection,
     RunRequest,
     SkipReason
 )
-from datetime import datetime, timedelta
+from crypto_pipeline.assets.crypto_assets import SCHEDULES_TIMEZONE
 from crypto_pipeline.jobs.crypto_jobs import (
     crypto_metadata_job,
     crypto_market_data_job,
@@ -20,53 +22,83 @@ from crypto_pipeline.jobs.crypto_jobs import (
     crypto_monthly_report_job
 )
 
-# Partitions quotidiennes pour les 6 derniers mois
-DAILY_PARTITIONS = DailyPartitionsDefinition(start_date=datetime.now() - timedelta(days=180))
-
-# Partitions mensuelles à partir de 2023
-MONTHLY_PARTITIONS = MonthlyPartitionsDefinition(start_date=datetime(2023, 1, 1))
-
-# Schedule pour le job de métadonnées (désactivé)
+# Schedule pour le job de métadonnées (arrêté par défaut)
 metadata_schedule = ScheduleDefinition(
     name="metadata_schedule",
-    cron_schedule="0 0 * * 0",  # Toutes les heures
+    cron_schedule="0 0 * * 0",  # Tous les dimanches à minuit
     job=crypto_metadata_job,
     execution_timezone="Europe/Paris",
-    should_execute=lambda context: False,  # Désactivé
+    default_status=DefaultScheduleStatus.STOPPED,  # Hors de la boucle du daemon tant qu'il n'est pas démarré
 )
 
-# Schedule pour le job de données de marché (désactivé)
-market_data_schedule = ScheduleDefinition(
+# Les jobs partitionnés sont planifiés à l'heure de Paris (SCHEDULES_TIMEZONE), mais
+# leurs partitions restent en UTC : build_schedule_from_partitioned_job imposerait le
+# fuseau des partitions. Chaque tick lance la partition précédant la date UTC du tick,
+# qui est close tant que le tick tombe après minuit UTC. Ces schedules sont arrêtés par
+# défaut (DefaultScheduleStatus.STOPPED).
+
+def _previous_day(utc_date: date) -> str:
+    """
+    Clé de la partition journalière de la veille.
+    """
+    return (utc_date - timedelta(days=1)).isoformat()
+
+def _previous_month(utc_date: date) -> str:
+    """
+    Clé de la partition mensuelle du mois précédent.
+    """
+    return (utc_date.replace(day=1) - timedelta(days=1)).replace(day=1).isoformat()
+
+def _partitioned_schedule(job, name: str, cron_schedule: str, partition_key_for: Callable[[date], str]):
+    """
+    Construit un schedule exécuté à l'heure de Paris qui lance la partition
+    `partition_key_for(date UTC du tick)` du job.
+    """
+    @schedule(
+        name=name,
+        job=job,
+        cron_schedule=cron_schedule,
+        execution_timezone=SCHEDULES_TIMEZONE,
+        default_status=DefaultScheduleStatus.STOPPED,  # Hors de la boucle du daemon tant qu'il n'est pas démarré
+    )
+    def _schedule(context: ScheduleEvaluationContext):
+        scheduled_at = context.scheduled_execution_time or datetime.now(timezone.utc)
+        partition_key = partition_key_for(scheduled_at.astimezone(timezone.utc).date())
+        return RunRequest(run_key=f"{name}:{partition_key}", partition_key=partition_key)
+    
+    return _schedule
+
+# Schedule pour le job de données de marché (arrêté par défaut)
+market_data_schedule = _partitioned_schedule(
+    crypto_market_data_job,
     name="market_data_schedule",
-    cron_schedule="0 * * * *",  # Toutes les heures
-    job=crypto_market_data_job,
-    execution_timezone="Europe/Paris",
-    should_execute=lambda context: False,  # Désactivé
+    cron_schedule="0 8 * * *",  # Tous les jours à 8h
+    partition_key_for=_previous_day,
 )
 
-# Schedule pour le job d'historique des prix (désactivé)
-price_history_schedule = ScheduleDefinition(
+# Schedule pour le job d'historique des prix (arrêté par défaut)
+price_history_schedule = _partitioned_schedule(
+    crypto_price_history_job,
     name="price_history_schedule",
-    cron_schedule="0 * * * *",  # Toutes les heures
-    job=crypto_price_history_job,
-    execution_timezone="Europe/Paris",
-    should_execute=lambda context: False,  # Désactivé
+    cron_schedule="0 9 * * *",  # Tous les jours à 9h
+    partition_key_for=_previous_day,
 )
 
-# Schedule pour le job d'analyse (désactivé)
+# Schedule pour le job d'analyse (arrêté par défaut)
 analytics_schedule = ScheduleDefinition(
     name="analytics_schedule",
     cron_schedule="0 * * * *",  # Toutes les heures
     job=crypto_analytics_job,
     execution_timezone="Europe/Paris",
-    should_execute=lambda context: False,  # Désactivé
+    default_status=DefaultScheduleStatus.STOPPED,  # Hors de la boucle du daemon tant qu'il n'est pas démarré
 )
 
-# Schedule pour le rapport mensuel (désactivé)
-monthly_report_schedule = ScheduleDefinition(
+# Schedule pour le rapport mensuel (arrêté par défaut)
+monthly_report_schedule = _partitioned_schedule(
+    crypto_monthly_report_job,
     name="monthly_report_schedule",
-    cron_schedule="0 0 1 * *",  # Le premier jour de chaque mois à minuit
-    job=crypto_monthly_report_job,
-    execution_timezone="Europe/Paris",
-    should_execute=lambda context: False,  # Désactivé
-) 
\ No newline at end of file
+    # Le premier jour de chaque mois à 2h : à minuit (heure de Paris), le mois UTC
+    # précédent n'est pas encore clos et sa partition n'existe pas
+    cron_schedule="0 2 1 * *",
+    partition_key_for=_previous_month,
+)
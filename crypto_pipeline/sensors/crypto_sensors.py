@@ -8,9 +8,11 @@ from dagster import (
     DefaultSensorStatus,
     SensorEvaluationContext,
     SensorResult,
+    SkipReason,
     PartitionKeyRange
 )
 import os
+import time
 from datetime import datetime, timedelta
 from crypto_pipeline.jobs.crypto_jobs import (
     crypto_analytics_job,
@@ -36,14 +38,14 @@ def price_movement_sensor(context: SensorEvaluationContext):
     # Dans une implémentation réelle, on vérifierait la base de données pour les mouvements de prix
     # Pour cet exemple simple, on déclenche le job une fois par jour
     
-    # Vérifier si le job a déjà été déclenché aujourd'hui
-    last_run_time = context.last_run_key
-    current_time = datetime.now().strftime("%Y-%m-%d")
+    # Vérifier si le job a déjà été déclenché aujourd'hui (clé : numéro du jour depuis l'epoch, UTC)
+    current_day = str(int(time.time()) // 86400)
     
-    if last_run_time != current_time:
+    if context.last_run_key != current_day:
+        current_time = datetime.now().strftime("%Y-%m-%d")
         context.log.info(f"Déclenchement de l'analyse des prix pour la journée {current_time}")
         return RunRequest(
-            run_key=current_time,
+            run_key=current_day,
             tags={"sensor": "price_movement", "reason": "daily_trigger", "date": current_time}
         )
     
@@ -66,19 +68,20 @@ def api_data_sensor(context: SensorEvaluationContext):
     # Dans une implémentation réelle, on vérifierait réellement si l'API a de nouvelles données
     # Pour cet exemple simple, on déclenche le job toutes les heures
     
-    last_run_time = context.last_run_key
-    current_hour = datetime.now().strftime("%Y-%m-%d-%H")
+    # Clé de run : numéro de l'heure depuis l'epoch
+    current_hour_bucket = str(int(time.time()) // 3600)
     
-    # Utiliser une partition qui existe dans notre définition
-    # Nous utilisons la date de début de notre définition de partitions
-    partition_key = START_DATE.strftime("%Y-%m-%d")
-    
-    if last_run_time != current_hour:
+    if context.last_run_key != current_hour_bucket:
+        current_hour = datetime.now().strftime("%Y-%m-%d-%H")
         context.log.info(f"Nouvelles données détectées sur l'API pour l'heure {current_hour}")
         
+        # Utiliser une partition qui existe dans notre définition
+        # Nous utilisons la date de début de notre définition de partitions
+        partition_key = START_DATE.strftime("%Y-%m-%d")
+        
         # Utiliser une partition existante (premier jour de notre définition)
         return RunRequest(
-            run_key=current_hour,
+            run_key=current_hour_bucket,
             tags={"sensor": "api_data", "reason": "hourly_update", "hour": current_hour},
             partition_key=partition_key  # Utiliser une partition qui existe de manière certaine
         )
@@ -98,27 +101,37 @@ def visualization_files_sensor(context: SensorEvaluationContext):
     
     Ce capteur vérifie si de nouveaux fichiers de visualisation ont été créés et
     les enregistre pour référence (dans un cas réel, on pourrait envoyer des notifications).
+    Le curseur conserve la date de modification (en nanosecondes) du PNG le plus récent
+    déjà signalé : un graphique réécrit sur place est détecté, et les autres fichiers
+    du répertoire (cache, journaux DuckDB) sont ignorés.
     """
     visualizations_dir = "crypto_pipeline/data"
-    detected_files = []
     
-    # Vérifier si le répertoire existe
-    if not os.path.exists(visualizations_dir):
-        return None
+    # Dates de modification des PNG, en un seul parcours du répertoire
+    try:
+        with os.scandir(visualizations_dir) as entries:
+            png_mtimes = {
+                entry.name: entry.stat().st_mtime_ns
+                for entry in entries
+                if entry.name.endswith(".png") and entry.is_file()
+            }
+    except FileNotFoundError:
+        return SkipReason(f"Le répertoire {visualizations_dir} n'existe pas encore")
+    
+    try:
+        last_mtime_ns = int(context.cursor or 0)
+    except ValueError:
+        # Curseur d'un format antérieur : on repart de zéro
+        last_mtime_ns = 0
     
-    # Trouver tous les fichiers de visualisation créés dans les dernières 24 heures
-    now = datetime.now()
-    for file in os.listdir(visualizations_dir):
-        if file.endswith(".png"):
-            file_path = os.path.join(visualizations_dir, file)
-            file_mtime = datetime.fromtimestamp(os.path.getmtime(file_path))
-            
-            # Si le fichier a été créé/modifié dans les dernières 24 heures
-            if now - file_mtime < timedelta(days=1):
-                detected_files.append(file)
+    # Fichiers créés/modifiés depuis le dernier signalement, et dans les dernières 24 heures
+    cutoff_ns = max(last_mtime_ns, int((datetime.now() - timedelta(days=1)).timestamp() * 1e9))
+    detected_files = sorted(name for name, mtime_ns in png_mtimes.items() if mtime_ns > cutoff_ns)
+    if not detected_files:
+        return SkipReason("Aucun nouveau fichier de visualisation")
+    context.update_cursor(str(max(png_mtimes.values())))
     
-    if detected_files:
-        context.log.info(f"Fichiers de visualisation détectés: {', '.join(detected_files)}")
-        # Modifier pour envoyer un email ou une notification par exemple
+    context.log.info(f"Fichiers de visualisation détectés: {', '.join(detected_files)}")
+    # Modifier pour envoyer un email ou une notification par exemple
     # Ce capteur ne déclenche pas de job, il enregistre simplement l'information
     return None 
\ No newline at end of file
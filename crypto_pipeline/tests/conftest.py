@@ -0,0 +1,57 @@
+"""
+Fixtures partagées par les tests.
+"""
+
+import pytest
+from unittest.mock import create_autospec
+from dagster import ResourceDefinition, build_init_resource_context, build_op_context
+from crypto_pipeline.resources.coingecko_resource import CoinGeckoResource
+from crypto_pipeline.resources.duckdb_resource import DuckDBResource
+
+
+@pytest.fixture(scope="module")
+def mock_resources():
+    """Ressources simulées, créées une fois par module de tests (spécifiées sur les vraies classes)"""
+    return {
+        "coingecko_resource": create_autospec(CoinGeckoResource, instance=True),
+        "duckdb_resource": create_autospec(DuckDBResource, instance=True),
+    }
+
+
+@pytest.fixture(scope="module")
+def op_context(mock_resources):
+    """Contexte d'exécution partagé par les tests d'un module (une seule instance Dagster)"""
+    # Les mocks autospec passent isinstance(ConfigurableResource) : on les fournit tels quels
+    resources = {
+        key: ResourceDefinition.hardcoded_resource(resource)
+        for key, resource in mock_resources.items()
+    }
+    with build_op_context(resources=resources) as context:
+        yield context
+
+
+@pytest.fixture
+def coingecko_resource(mock_resources):
+    """Mock de la ressource CoinGecko, remis à zéro avant chaque test"""
+    resource = mock_resources["coingecko_resource"]
+    resource.reset_mock(return_value=True, side_effect=True)
+    return resource
+
+
+@pytest.fixture
+def duckdb_resource(mock_resources):
+    """Mock de la ressource DuckDB, remis à zéro avant chaque test"""
+    resource = mock_resources["duckdb_resource"]
+    resource.reset_mock(return_value=True, side_effect=True)
+    return resource
+
+
+@pytest.fixture
+def tmp_duckdb_resource(tmp_path):
+    """Vraie ressource DuckDB sur une base et un dataset Parquet temporaires, fermée après le test"""
+    resource = DuckDBResource(
+        database_path=str(tmp_path / "test.duckdb"),
+        price_history_path=str(tmp_path / "price_history")
+    )
+    yield resource
+    resource.teardown_after_execution(build_init_resource_context())
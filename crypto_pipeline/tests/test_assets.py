@@ -2,11 +2,15 @@
 Tests unitaires pour les assets.
 """
 
+import os
 import pytest
-from unittest.mock import MagicMock, patch
+from unittest.mock import create_autospec, patch
 import pandas as pd
+import pyarrow as pa
 from datetime import datetime
-from dagster import build_op_context
+from matplotlib.axes import Axes
+from matplotlib.figure import Figure
+from dagster import DagsterInstance, SkipReason, build_schedule_context, build_sensor_context
 from crypto_pipeline.assets.crypto_assets import (
     crypto_coins_list,
     store_crypto_list,
@@ -15,7 +19,17 @@ from crypto_pipeline.assets.crypto_assets import (
     crypto_price_history,
     store_price_history,
     crypto_price_trends,
-    crypto_price_visualization
+    crypto_price_visualization,
+    monthly_crypto_report
+)
+from crypto_pipeline.assets.crypto_assets import DUCKDB_WRITER_POOL
+from crypto_pipeline.definitions import defs
+from crypto_pipeline.utils import visualization
+from crypto_pipeline.sensors.crypto_sensors import visualization_files_sensor
+from crypto_pipeline.schedules.crypto_schedules import (
+    market_data_schedule,
+    price_history_schedule,
+    monthly_report_schedule
 )
 
 # Données de test
@@ -64,120 +78,102 @@ TEST_PRICE_TRENDS = pd.DataFrame([
 ])
 
 # Tests pour les assets
-def test_crypto_coins_list():
+def test_crypto_coins_list(op_context, coingecko_resource):
     """Teste l'asset crypto_coins_list"""
-    # Création du mock pour la ressource CoinGecko
-    coingecko_resource = MagicMock()
+    # Configuration du mock de la ressource CoinGecko
     coingecko_resource.get_coin_list.return_value = TEST_COIN_LIST
     
-    # Création du contexte d'exécution
-    context = build_op_context()
-    
     # Test de l'asset
-    result = crypto_coins_list(context, coingecko_resource)
+    result = crypto_coins_list(op_context)
     
     # Vérifications
     coingecko_resource.get_coin_list.assert_called_once()
-    assert result == TEST_COIN_LIST
-    assert len(result) == 2
-    assert result[0]["id"] == "bitcoin"
+    assert result.to_pylist() == TEST_COIN_LIST
+    assert result.num_rows == 2
+    assert result.column("id")[0].as_py() == "bitcoin"
 
-def test_store_crypto_list():
+def test_store_crypto_list(op_context, duckdb_resource):
     """Teste l'asset store_crypto_list"""
-    # Création des mocks
-    duckdb_resource = MagicMock()
-    
-    # Création du contexte d'exécution
-    context = build_op_context()
+    # Données de test : table Arrow produite par crypto_coins_list
+    coin_table = pa.Table.from_pylist(TEST_COIN_LIST)
     
     # Test de l'asset
-    store_crypto_list(context, duckdb_resource, TEST_COIN_LIST)
+    store_crypto_list(op_context, coin_table)
     
     # Vérifications
-    duckdb_resource.create_tables.assert_called_once()
-    duckdb_resource.store_coin_list.assert_called_once_with(TEST_COIN_LIST)
+    duckdb_resource.store_coin_list.assert_called_once_with(coin_table)
 
-def test_crypto_market_data():
+def test_crypto_market_data(op_context, coingecko_resource):
     """Teste l'asset crypto_market_data"""
-    # Création du mock pour la ressource CoinGecko
-    coingecko_resource = MagicMock()
-    coingecko_resource.get_coin_market_data.return_value = TEST_MARKET_DATA
-    
-    # Création du contexte d'exécution
-    context = build_op_context()
+    # Configuration du mock de la ressource CoinGecko
+    coingecko_resource.get_coin_market_data_paged.return_value = iter(TEST_MARKET_DATA)
     
     # Test de l'asset
-    result = crypto_market_data(context, coingecko_resource)
+    result = crypto_market_data(op_context)
     
     # Vérifications
-    coingecko_resource.get_coin_market_data.assert_called_once()
-    assert result == TEST_MARKET_DATA
-    assert len(result) == 2
-    assert result[0]["id"] == "bitcoin"
-    assert result[1]["id"] == "ethereum"
+    coingecko_resource.get_coin_market_data_paged.assert_called_once()
+    assert result.num_rows == 2
+    assert result.column("id").to_pylist() == ["bitcoin", "ethereum"]
+    assert result.column("current_price").to_pylist() == [50000, 3000]
 
-def test_store_market_data():
+def test_store_market_data(op_context, duckdb_resource):
     """Teste l'asset store_market_data"""
-    # Création des mocks
-    duckdb_resource = MagicMock()
-    
-    # Création du contexte d'exécution
-    context = build_op_context()
+    # Données de test : table Arrow produite par crypto_market_data
+    market_table = pa.Table.from_pylist(TEST_MARKET_DATA)
     
     # Test de l'asset
-    store_market_data(context, duckdb_resource, TEST_MARKET_DATA)
+    store_market_data(op_context, market_table)
     
-    # Vérifications
-    duckdb_resource.store_market_data.assert_called_once_with(TEST_MARKET_DATA)
+    # Vérifications : run non partitionné, données rattachées à la date du jour
+    duckdb_resource.store_market_data.assert_called_once_with(
+        market_table, partition_date=datetime.now().date()
+    )
 
-def test_crypto_price_history():
+def test_crypto_price_history(op_context, coingecko_resource):
     """Teste l'asset crypto_price_history"""
-    # Création du mock pour la ressource CoinGecko
-    coingecko_resource = MagicMock()
-    coingecko_resource.get_coin_price_history.side_effect = lambda coin_id: TEST_PRICE_HISTORY[coin_id]
+    # Configuration du mock de la ressource CoinGecko
+    coingecko_resource.get_price_histories.return_value = TEST_PRICE_HISTORY
     
-    # Création du contexte d'exécution
-    context = build_op_context()
-    
-    # Patch pour remplacer la liste des cryptomonnaies suivies
-    with patch('crypto_pipeline.assets.crypto_assets.TOP_CRYPTO_COINS', ["bitcoin", "ethereum"]):
-        # Test de l'asset
-        result = crypto_price_history(context, coingecko_resource)
+    # Test de l'asset
+    result = crypto_price_history(op_context)
     
-    # Vérifications
-    assert coingecko_resource.get_coin_price_history.call_count == 2
-    assert "bitcoin" in result
-    assert "ethereum" in result
-    assert result["bitcoin"] == TEST_PRICE_HISTORY["bitcoin"]
-    assert result["ethereum"] == TEST_PRICE_HISTORY["ethereum"]
+    # Vérifications : un seul appel groupé, sans fenêtre hors partition
+    coingecko_resource.get_price_histories.assert_called_once()
+    assert "from_ts" not in coingecko_resource.get_price_histories.call_args.kwargs
+    assert result == [
+        {"coin_id": "bitcoin", "history": TEST_PRICE_HISTORY["bitcoin"]},
+        {"coin_id": "ethereum", "history": TEST_PRICE_HISTORY["ethereum"]},
+    ]
 
-def test_store_price_history():
+def test_store_price_history(op_context, duckdb_resource):
     """Teste l'asset store_price_history"""
-    # Création des mocks
-    duckdb_resource = MagicMock()
-    
-    # Création du contexte d'exécution
-    context = build_op_context()
+    # Données de test : liste produite par crypto_price_history
+    price_history = [
+        {"coin_id": coin_id, "history": history}
+        for coin_id, history in TEST_PRICE_HISTORY.items()
+    ]
     
     # Test de l'asset
-    store_price_history(context, duckdb_resource, TEST_PRICE_HISTORY)
+    store_price_history(op_context, price_history)
     
     # Vérifications
-    assert duckdb_resource.store_price_history.call_count == 2
-    duckdb_resource.store_price_history.assert_any_call("bitcoin", TEST_PRICE_HISTORY["bitcoin"])
-    duckdb_resource.store_price_history.assert_any_call("ethereum", TEST_PRICE_HISTORY["ethereum"])
+    duckdb_resource.store_price_histories.assert_called_once_with(price_history)
 
-def test_crypto_price_trends():
+@pytest.mark.parametrize("duckdb_asset", [
+    store_crypto_list, store_market_data, store_price_history, crypto_price_trends, monthly_crypto_report
+])
+def test_duckdb_assets_share_duckdb_writer_pool(duckdb_asset):
+    """Teste que tous les assets qui ouvrent la base DuckDB, écrivains comme lecteurs, passent par le même pool"""
+    assert duckdb_asset.op.pool == DUCKDB_WRITER_POOL
+
+def test_crypto_price_trends(op_context, duckdb_resource):
     """Teste l'asset crypto_price_trends"""
-    # Création des mocks
-    duckdb_resource = MagicMock()
+    # Configuration du mock de la ressource DuckDB
     duckdb_resource.get_top_coins.return_value = TEST_PRICE_TRENDS
     
-    # Création du contexte d'exécution
-    context = build_op_context()
-    
     # Test de l'asset
-    result = crypto_price_trends(context, duckdb_resource)
+    result = crypto_price_trends(op_context)
     
     # Vérifications
     duckdb_resource.get_top_coins.assert_called_once_with(10)
@@ -186,26 +182,97 @@ def test_crypto_price_trends():
     assert "bitcoin" in result["id"].values
     assert "ethereum" in result["id"].values
 
-@patch('crypto_pipeline.assets.crypto_assets.plt')
-def test_crypto_price_visualization(mock_plt):
+@patch('crypto_pipeline.utils.visualization._get_fig')
+def test_crypto_price_visualization(mock_get_fig, op_context):
     """Teste l'asset crypto_price_visualization"""
-    # Création des mocks
-    duckdb_resource = MagicMock()
-    duckdb_resource.get_price_history_for_coin.return_value = pd.DataFrame({
-        "timestamp": [datetime(2022, 1, 1), datetime(2022, 1, 2)],
-        "price": [50000, 52000],
-        "market_cap": [1000000000000, 1050000000000],
-        "total_volume": [50000000000, 52000000000]
-    })
-    
-    # Création du contexte d'exécution
-    context = build_op_context()
+    # Configuration du mock : figure du pool et son unique axe
+    mock_fig, mock_ax = create_autospec(Figure, instance=True), create_autospec(Axes, instance=True)
+    mock_get_fig.return_value = (mock_fig, [mock_ax])
     
     # Test de l'asset
-    result = crypto_price_visualization(context, duckdb_resource, TEST_PRICE_TRENDS)
+    result = crypto_price_visualization(op_context, TEST_PRICE_TRENDS)
+    
+    # Vérifications : figure du pool partagé, graphique sauvegardé
+    mock_get_fig.assert_called_once_with(1, 1, (12, 8))
+    mock_ax.bar.assert_called_once()
+    mock_fig.savefig.assert_called_once_with("crypto_pipeline/data/price_trends.png")
+    assert result == "crypto_pipeline/data/price_trends.png"
+
+def test_monthly_crypto_report(op_context, duckdb_resource, tmp_path, monkeypatch):
+    """Teste l'asset monthly_crypto_report"""
+    # Configuration du mock : top coins et deux points d'historique chacun
+    duckdb_resource.get_top_coins_with_history.return_value = pd.concat([
+        TEST_PRICE_TRENDS.assign(rn=[1, 2], timestamp=pd.Timestamp("2024-02-01"), hist_price=[49000.0, 2900.0]),
+        TEST_PRICE_TRENDS.assign(rn=[1, 2], timestamp=pd.Timestamp("2024-02-02"), hist_price=[50000.0, 3000.0]),
+    ]).sort_values(["rn", "timestamp"])
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "crypto_pipeline" / "data").mkdir(parents=True)
+    
+    # Test de l'asset
+    with patch('crypto_pipeline.utils.visualization._save_png', wraps=visualization._save_png) as mock_save:
+        top_coins, file_path = monthly_crypto_report(op_context)
+    
+    # Vérifications : PNG écrit par l'encodeur partagé des graphiques, à 100 DPI
+    mock_save.assert_called_once()
+    assert mock_save.call_args.args[1] == file_path
+    assert mock_save.call_args.kwargs == {"dpi": 100}
+    assert (tmp_path / file_path).stat().st_size > 0
+    assert top_coins["id"].tolist() == ["bitcoin", "ethereum"]
+
+def test_visualization_files_sensor_tracks_png_mtimes(tmp_path, monkeypatch):
+    """Teste que le capteur ne signale que les PNG nouveaux ou réécrits depuis son dernier passage"""
+    # Répertoire de visualisations absent : rien à signaler
+    monkeypatch.chdir(tmp_path)
+    assert isinstance(visualization_files_sensor(build_sensor_context()), SkipReason)
+    
+    # Répertoire de visualisations avec un graphique récent
+    data_dir = tmp_path / "crypto_pipeline" / "data"
+    data_dir.mkdir(parents=True)
+    chart = data_dir / "price_trends.png"
+    chart.write_bytes(b"")
+    mtime_ns = chart.stat().st_mtime_ns
+    context = build_sensor_context()
+    
+    # Premier passage : le graphique est signalé
+    assert visualization_files_sensor(context) is None
+    assert context.cursor == str(mtime_ns)
+    
+    # Rien de nouveau, ou seulement un fichier qui n'est pas un PNG : pas de signalement
+    assert isinstance(visualization_files_sensor(context), SkipReason)
+    (data_dir / "coingecko_cache.sqlite").write_bytes(b"")
+    assert isinstance(visualization_files_sensor(context), SkipReason)
+    
+    # Graphique réécrit sur place : il est signalé de nouveau
+    os.utime(chart, ns=(mtime_ns + 10**9, mtime_ns + 10**9))
+    assert visualization_files_sensor(context) is None
+    assert context.cursor == str(mtime_ns + 10**9)
+
+@pytest.mark.parametrize("schedule_def,cron_schedule", [
+    (market_data_schedule, "0 8 * * *"),
+    (price_history_schedule, "0 9 * * *"),
+    (monthly_report_schedule, "0 2 1 * *"),
+])
+def test_partitioned_schedules_paris_time(schedule_def, cron_schedule):
+    """Teste que les schedules des jobs partitionnés suivent l'heure de Paris"""
+    assert schedule_def.cron_schedule == cron_schedule
+    assert schedule_def.execution_timezone == "Europe/Paris"
+
+@pytest.mark.parametrize("schedule_def,scheduled_at,partition_key", [
+    (market_data_schedule, "2024-01-01T08:00:00+01:00", "2023-12-31"),
+    (price_history_schedule, "2024-07-01T09:00:00+02:00", "2024-06-30"),
+    (monthly_report_schedule, "2024-03-01T02:00:00+01:00", "2024-02-01"),
+    (monthly_report_schedule, "2024-07-01T02:00:00+02:00", "2024-06-01"),
+])
+def test_partitioned_schedules_latest_utc_partition(schedule_def, scheduled_at, partition_key):
+    """Teste que chaque tick lance une partition UTC close, acceptée par le job"""
+    # Évaluation complète du tick : une clé de partition inconnue du job fait échouer le test
+    with DagsterInstance.ephemeral() as instance:
+        context = build_schedule_context(
+            instance=instance,
+            scheduled_execution_time=datetime.fromisoformat(scheduled_at),
+            repository_def=defs.get_repository_def(),
+        )
+        run_requests = schedule_def.evaluate_tick(context).run_requests
     
     # Vérifications
-    assert duckdb_resource.get_price_history_for_coin.call_count > 0
-    assert mock_plt.figure.call_count > 0
-    assert mock_plt.savefig.call_count > 0
-    assert result == "Visualisations créées avec succès" 
\ No newline at end of file
+    assert [run_request.partition_key for run_request in run_requests] == [partition_key]
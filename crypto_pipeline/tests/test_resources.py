@@ -3,76 +3,203 @@ Tests unitaires pour les ressources.
 """
 
 import pytest
+import io
 import os
+import shutil
 import pandas as pd
-from unittest.mock import MagicMock, patch
-from crypto_pipeline.resources.coingecko_resource import CoinGeckoResource
-from crypto_pipeline.resources.duckdb_resource import DuckDBResource
+import pyarrow as pa
+import pyarrow.parquet as pq
+import json
+import requests
+import requests_cache
+import urllib3
+import duckdb
+from datetime import date
+from unittest.mock import MagicMock, create_autospec, patch
+from dagster import asset, build_init_resource_context, materialize
+from crypto_pipeline.assets.crypto_assets import DAILY_PARTITIONS
+from crypto_pipeline.resources import coingecko_resource
+from crypto_pipeline.resources.coingecko_resource import CoinGeckoResource, REQUEST_TIMEOUT
+from crypto_pipeline.resources.duckdb_resource import (
+    DuckDBResource,
+    EMPTY_PRICE_HISTORY,
+    EMPTY_TOP_COINS,
+    MARKET_DATA_SCHEMA,
+    to_arrow_table,
+)
+from crypto_pipeline.resources.parquet_io_manager import ParquetIOManagerFactory
+from upath import UPath
 
 # Tests pour CoinGeckoResource
 def test_coingecko_resource_init():
     """Teste l'initialisation de la ressource CoinGecko"""
     resource = CoinGeckoResource()
     assert resource.base_url == "https://api.coingecko.com/api/v3"
+    assert resource.calls_per_minute == 30
 
-@patch('crypto_pipeline.resources.coingecko_resource.requests.get')
-def test_get_coin_list(mock_get):
+@patch('crypto_pipeline.resources.coingecko_resource.time')
+def test_wait_for_slot_calls_per_minute(mock_time):
+    """Teste que le nombre de requêtes est limité sur une minute glissante"""
+    # Configuration du mock : l'horloge reste à 100 s
+    mock_time.monotonic.return_value = 100.0
+    
+    # Test de la méthode
+    resource = CoinGeckoResource(rate_limit_delay=0, calls_per_minute=2)
+    for _ in range(3):
+        resource._wait_for_slot()
+    
+    # Vérifications : seule la troisième requête attend la fin de la fenêtre
+    mock_time.sleep.assert_called_once_with(60.0)
+
+@patch.object(CoinGeckoResource, '_get_cached_session')
+def test_get_coin_list(mock_get_session):
     """Teste la méthode get_coin_list de CoinGeckoResource"""
-    # Configuration du mock
+    # Configuration du mock : réponse absente du cache, puis réponse de l'API
+    mock_session = MagicMock(spec=requests_cache.CachedSession)
+    mock_cache_miss = MagicMock(ok=False)
     mock_response = MagicMock()
-    mock_response.json.return_value = [
+    mock_response.content = json.dumps([
         {"id": "bitcoin", "symbol": "btc", "name": "Bitcoin"},
         {"id": "ethereum", "symbol": "eth", "name": "Ethereum"}
-    ]
+    ]).encode()
     mock_response.raise_for_status.return_value = None
-    mock_get.return_value = mock_response
+    mock_session.get.side_effect = [mock_cache_miss, mock_response]
+    mock_get_session.return_value = mock_session
     
     # Test de la méthode
     resource = CoinGeckoResource()
     result = resource.get_coin_list()
     
     # Vérifications
-    mock_get.assert_called_once_with("https://api.coingecko.com/api/v3/coins/list")
+    mock_session.get.assert_called_with("https://api.coingecko.com/api/v3/coins/list", params=None, timeout=REQUEST_TIMEOUT)
+    assert mock_session.get.call_count == 2
     assert len(result) == 2
     assert result[0]["id"] == "bitcoin"
     assert result[1]["name"] == "Ethereum"
 
-@patch('crypto_pipeline.resources.coingecko_resource.requests.get')
+@patch('crypto_pipeline.resources.coingecko_resource.requests.Session.get')
+@patch.object(CoinGeckoResource, '_get_cached_session')
+def test_get_coin_list_from_cache(mock_get_session, mock_get):
+    """Teste que get_coin_list n'interroge pas l'API lorsque la liste est en cache"""
+    # Configuration du mock
+    mock_session = MagicMock(spec=requests_cache.CachedSession)
+    mock_session.get.return_value = MagicMock(ok=True)
+    mock_session.get.return_value.content = json.dumps([{"id": "bitcoin", "symbol": "btc", "name": "Bitcoin"}]).encode()
+    mock_get_session.return_value = mock_session
+    
+    # Test de la méthode
+    resource = CoinGeckoResource()
+    result = resource.get_coin_list()
+    
+    # Vérifications
+    mock_session.get.assert_called_once_with(
+        "https://api.coingecko.com/api/v3/coins/list", params=None, timeout=REQUEST_TIMEOUT, only_if_cached=True
+    )
+    mock_get.assert_not_called()
+    assert result[0]["id"] == "bitcoin"
+
+@patch.object(CoinGeckoResource, '_get_cached_session')
+def test_get_coin_list_revalidated(mock_get_session):
+    """Teste qu'une liste expirée mais inchangée (304) est relue depuis le cache"""
+    # Configuration du mock : entrée expirée, puis réponse revalidée par l'API
+    mock_session = MagicMock(spec=requests_cache.CachedSession)
+    mock_revalidated = MagicMock(revalidated=True)
+    mock_revalidated.content = json.dumps([{"id": "bitcoin", "symbol": "btc", "name": "Bitcoin"}]).encode()
+    mock_session.get.side_effect = [MagicMock(ok=False), mock_revalidated]
+    mock_get_session.return_value = mock_session
+    
+    # Test de la méthode
+    resource = CoinGeckoResource(rate_limit_delay=0)
+    result = resource.get_coin_list()
+    
+    # Vérifications
+    assert mock_session.get.call_count == 2
+    assert result == [{"id": "bitcoin", "symbol": "btc", "name": "Bitcoin"}]
+
+@patch.object(CoinGeckoResource, '_get_cached_session')
+def test_get_coin_list_memoized(mock_get_session):
+    """Teste que la liste est gardée en mémoire jusqu'à la fin de l'exécution"""
+    # Configuration du mock
+    mock_session = MagicMock(spec=requests_cache.CachedSession)
+    mock_session.get.return_value = MagicMock(ok=True)
+    mock_session.get.return_value.content = json.dumps([{"id": "bitcoin", "symbol": "btc", "name": "Bitcoin"}]).encode()
+    mock_get_session.return_value = mock_session
+    
+    # Test de la méthode
+    resource = CoinGeckoResource()
+    first = resource.get_coin_list()
+    second = resource.get_coin_list()
+    
+    # Vérifications : une seule lecture du cache pour les deux appels
+    mock_session.get.assert_called_once()
+    assert second is first
+    
+    # Après la fin de l'exécution, la liste est relue
+    resource.teardown_after_execution(build_init_resource_context())
+    resource.get_coin_list()
+    assert mock_session.get.call_count == 2
+
+def test_coin_list_cache_session(tmp_path):
+    """Teste la configuration de la session avec cache de la liste des cryptomonnaies"""
+    resource = CoinGeckoResource(cache_path=str(tmp_path / "coingecko_cache"), coin_list_cache_ttl=3600)
+    session = resource._get_cached_session()
+    
+    # Vérifications : session unique, expiration configurée
+    assert session is resource._get_cached_session()
+    assert session.settings.expire_after.total_seconds() == 3600
+
+@patch('crypto_pipeline.resources.coingecko_resource.requests.Session.get')
 def test_get_coin_market_data(mock_get):
     """Teste la méthode get_coin_market_data de CoinGeckoResource"""
     # Configuration du mock
     mock_response = MagicMock()
-    mock_response.json.return_value = [
+    mock_response.content = json.dumps([
         {
             "id": "bitcoin",
             "current_price": 50000,
             "market_cap": 1000000000000,
             "total_volume": 50000000000
         }
-    ]
+    ]).encode()
     mock_response.raise_for_status.return_value = None
     mock_get.return_value = mock_response
     
     # Test de la méthode
     resource = CoinGeckoResource()
-    result = resource.get_coin_market_data(["bitcoin"])
+    result = resource.get_coin_market_data(("bitcoin", "ethereum"))
     
-    # Vérifications
+    # Vérifications : une seule requête avec les identifiants séparés par des virgules
     mock_get.assert_called_once()
+    assert mock_get.call_args.kwargs["params"]["ids"] == "bitcoin,ethereum"
     assert len(result) == 1
     assert result[0]["id"] == "bitcoin"
     assert result[0]["current_price"] == 50000
 
-@patch('crypto_pipeline.resources.coingecko_resource.requests.get')
+@patch.object(CoinGeckoResource, 'get_coin_market_data')
+def test_get_coin_market_data_paged(mock_get_market_data):
+    """Teste le découpage des identifiants en lots de 250 pour /coins/markets"""
+    # Configuration du mock : une ligne par identifiant demandé
+    mock_get_market_data.side_effect = lambda ids, vs_currency: [{"id": coin_id} for coin_id in ids]
+    coin_ids = [f"coin-{i}" for i in range(600)]
+    
+    # Test de la méthode
+    resource = CoinGeckoResource()
+    result = list(resource.get_coin_market_data_paged(coin_ids))
+    
+    # Vérifications : 3 requêtes (250 + 250 + 100), ordre conservé
+    assert [len(c.args[0]) for c in mock_get_market_data.call_args_list] == [250, 250, 100]
+    assert [row["id"] for row in result] == coin_ids
+
+@patch('crypto_pipeline.resources.coingecko_resource.requests.Session.get')
 def test_get_coin_price_history(mock_get):
     """Teste la méthode get_coin_price_history de CoinGeckoResource"""
     # Configuration du mock
     mock_response = MagicMock()
-    mock_response.json.return_value = {
+    mock_response.content = json.dumps({
         "prices": [[1617753600000, 50000], [1617840000000, 52000]],
         "market_caps": [[1617753600000, 1000000000000], [1617840000000, 1050000000000]],
         "total_volumes": [[1617753600000, 50000000000], [1617840000000, 52000000000]]
-    }
+    }).encode()
     mock_response.raise_for_status.return_value = None
     mock_get.return_value = mock_response
     
@@ -86,6 +213,154 @@ def test_get_coin_price_history(mock_get):
     assert result["prices"][0][1] == 50000
     assert result["prices"][1][1] == 52000
 
+@patch('crypto_pipeline.resources.coingecko_resource.requests.Session.get')
+def test_get_coin_price_history_range(mock_get):
+    """Teste la méthode get_coin_price_history_range de CoinGeckoResource"""
+    # Configuration du mock
+    mock_response = MagicMock()
+    mock_response.content = json.dumps({
+        "prices": [[1617753600000, 50000], [1617757200000, 50100]],
+        "market_caps": [[1617753600000, 1000000000000], [1617757200000, 1001000000000]],
+        "total_volumes": [[1617753600000, 50000000000], [1617757200000, 50100000000]]
+    }).encode()
+    mock_response.raise_for_status.return_value = None
+    mock_get.return_value = mock_response
+    
+    # Test de la méthode
+    resource = CoinGeckoResource(rate_limit_delay=0)
+    result = resource.get_coin_price_history_range("bitcoin", 1617753600, 1617840000)
+    
+    # Vérifications
+    mock_get.assert_called_once_with(
+        "https://api.coingecko.com/api/v3/coins/bitcoin/market_chart/range",
+        params={"vs_currency": "usd", "from": 1617753600, "to": 1617840000},
+        timeout=REQUEST_TIMEOUT
+    )
+    assert len(result["prices"]) == 2
+
+@patch('crypto_pipeline.resources.coingecko_resource.requests.Session.get')
+def test_get_price_histories(mock_get):
+    """Teste la récupération parallèle de l'historique des prix"""
+    # Configuration du mock
+    mock_response = MagicMock()
+    mock_response.content = json.dumps({
+        "prices": [[1617753600000, 50000]],
+        "market_caps": [[1617753600000, 1000000000000]],
+        "total_volumes": [[1617753600000, 50000000000]]
+    }).encode()
+    mock_response.raise_for_status.return_value = None
+    mock_get.return_value = mock_response
+    
+    # Test de la méthode
+    resource = CoinGeckoResource(rate_limit_delay=0)
+    result = resource.get_price_histories(["bitcoin", "ethereum", "cardano"])
+    
+    # Vérifications
+    assert mock_get.call_count == 3
+    assert list(result.keys()) == ["bitcoin", "ethereum", "cardano"]
+    assert result["bitcoin"]["prices"][0][1] == 50000
+
+@patch.object(CoinGeckoResource, 'get_coin_price_history_range')
+def test_get_price_histories_range_daily(mock_get_range):
+    """Teste que les points horaires de /market_chart/range sont ramenés à un point par jour"""
+    # Configuration du mock : 48 points horaires sur deux jours UTC
+    points = [[1617753600000 + hour * 3600000, 50000 + hour] for hour in range(48)]
+    mock_get_range.return_value = {"prices": points, "market_caps": points, "total_volumes": points}
+    
+    # Test de la méthode
+    resource = CoinGeckoResource(rate_limit_delay=0)
+    result = resource.get_price_histories(["bitcoin"], from_ts=1617753600, to_ts=1617926400)
+    
+    # Vérifications : le premier point de chaque jour, pour chaque série
+    for key in ("prices", "market_caps", "total_volumes"):
+        assert result["bitcoin"][key] == [[1617753600000, 50000], [1617840000000, 50024]]
+
+@pytest.mark.parametrize("parser", ["orjson", "json"])
+def test_loads_with_or_without_orjson(parser):
+    """Teste le décodage JSON avec orjson et le repli sur le module json standard"""
+    module = pytest.importorskip("orjson") if parser == "orjson" else None
+    
+    # Test de la fonction
+    with patch.object(coingecko_resource, "orjson", module):
+        result = coingecko_resource._loads(b'[{"id": "bitcoin", "current_price": 50000.5}]')
+    
+    # Vérifications
+    assert result == [{"id": "bitcoin", "current_price": 50000.5}]
+
+def test_session_retry_policy():
+    """Teste la politique de nouvelles tentatives montée sur la session (Retry-After respecté)"""
+    resource = CoinGeckoResource(max_retries=5, rate_limit_delay=1)
+    
+    # Test de la méthode
+    retries = resource._get_session().get_adapter("https://api.coingecko.com").max_retries
+    
+    # Vérifications : 5 tentatives au total, soit 4 nouvelles tentatives
+    assert retries.total == 4
+    assert retries.respect_retry_after_header
+    assert 429 in retries.status_forcelist
+    assert retries.backoff_factor == 1
+
+def test_retries_wait_for_slot():
+    """Teste que les nouvelles tentatives de l'adaptateur passent par _wait_for_slot"""
+    resource = CoinGeckoResource(rate_limit_delay=0)
+    
+    # Test de la méthode : une réponse 429, puis la pause avant la nouvelle tentative
+    with patch.object(CoinGeckoResource, "_wait_for_slot") as mock_wait:
+        retry = resource._retries().increment(method="GET", url="/coins/list", response=urllib3.HTTPResponse(status=429))
+        retry.sleep()
+    
+    # Vérifications : le rappel survit à la copie faite par urllib3
+    mock_wait.assert_called_once()
+
+@patch('crypto_pipeline.resources.coingecko_resource.requests.Session.get')
+def test_make_request_raises_after_retries(mock_get):
+    """Teste que l'erreur est propagée lorsque les nouvelles tentatives sont épuisées"""
+    # Configuration du mock
+    mock_get.side_effect = requests.exceptions.RetryError("too many 429 error responses")
+    
+    # Test de la méthode
+    resource = CoinGeckoResource(rate_limit_delay=0)
+    with pytest.raises(requests.exceptions.RetryError):
+        resource._make_request("/coins/markets")
+    
+    # Vérifications : pas de boucle de nouvelles tentatives côté Python
+    assert mock_get.call_count == 1
+
+@patch('crypto_pipeline.resources.coingecko_resource.requests.Session.close')
+def test_coingecko_session_pooled(mock_close):
+    """Teste que la session HTTP est partagée, équipée d'un pool et fermée à la fin de l'exécution"""
+    resource = CoinGeckoResource()
+    session = resource._get_session()
+    adapter = session.get_adapter("https://api.coingecko.com")
+    resource.teardown_after_execution(build_init_resource_context())
+    
+    # Vérifications
+    assert session is resource._get_session()
+    assert adapter._pool_maxsize == 16
+    assert session.headers["User-Agent"] == "crypto_pipeline/0.1"
+    mock_close.assert_called_once()
+
+@patch('urllib3.connectionpool.HTTPConnectionPool.urlopen')
+def test_coingecko_connection_reused(mock_urlopen):
+    """Teste que les requêtes de marché et d'historique partagent un seul pool de connexions HTTPS"""
+    # Configuration du mock : transport urllib3 simulé, l'adaptateur et son pool restent réels
+    mock_urlopen.side_effect = lambda *args, **kwargs: urllib3.HTTPResponse(
+        body=io.BytesIO(b'{"prices": []}'),
+        status=200,
+        headers={"Content-Type": "application/json"},
+        preload_content=False,
+    )
+    
+    # Test des méthodes
+    resource = CoinGeckoResource(rate_limit_delay=0)
+    resource.get_coin_market_data(["bitcoin", "ethereum"])
+    resource.get_coin_price_history("bitcoin")
+    
+    # Vérifications : deux requêtes, une seule session keep-alive et un seul pool vers l'API
+    assert mock_urlopen.call_count == 2
+    assert isinstance(resource._session, requests.Session)
+    assert len(resource._session.get_adapter(resource.base_url).poolmanager.pools) == 1
+
 # Tests pour DuckDBResource
 def test_duckdb_resource_init():
     """Teste l'initialisation de la ressource DuckDB"""
@@ -96,8 +371,8 @@ def test_duckdb_resource_init():
 def test_create_tables(mock_connect):
     """Teste la méthode create_tables de DuckDBResource"""
     # Configuration du mock
-    mock_conn = MagicMock()
-    mock_connect.return_value.__enter__.return_value = mock_conn
+    mock_conn = create_autospec(duckdb.DuckDBPyConnection, instance=True)
+    mock_connect.return_value.cursor.return_value.__enter__.return_value = mock_conn
     
     # Test de la méthode
     resource = DuckDBResource(database_path="test.duckdb")
@@ -105,14 +380,15 @@ def test_create_tables(mock_connect):
     
     # Vérifications
     mock_connect.assert_called_once_with("test.duckdb")
-    assert mock_conn.execute.call_count == 3  # 3 tables créées
+    assert mock_conn.execute.call_count == 1  # 3 tables (l'historique des prix est stocké en Parquet) et la vue latest_market_data, en une requête
 
+@patch.object(DuckDBResource, '_migrate_price_history_table')
 @patch('crypto_pipeline.resources.duckdb_resource.duckdb.connect')
-def test_store_coin_list(mock_connect):
+def test_store_coin_list(mock_connect, mock_migrate):
     """Teste la méthode store_coin_list de DuckDBResource"""
     # Configuration du mock
-    mock_conn = MagicMock()
-    mock_connect.return_value.__enter__.return_value = mock_conn
+    mock_conn = create_autospec(duckdb.DuckDBPyConnection, instance=True)
+    mock_connect.return_value.cursor.return_value.__enter__.return_value = mock_conn
     
     # Données de test
     test_data = [
@@ -128,13 +404,15 @@ def test_store_coin_list(mock_connect):
     mock_connect.assert_called_once_with("test.duckdb")
     mock_conn.execute.assert_called()  # La requête SQL est exécutée
     mock_conn.register.assert_called_once()  # Le DataFrame est enregistré
+    mock_conn.unregister.assert_called_once()  # La table Arrow est libérée après l'insertion
 
+@patch.object(DuckDBResource, '_migrate_price_history_table')
 @patch('crypto_pipeline.resources.duckdb_resource.duckdb.connect')
-def test_store_market_data(mock_connect):
+def test_store_market_data(mock_connect, mock_migrate):
     """Teste la méthode store_market_data de DuckDBResource"""
     # Configuration du mock
-    mock_conn = MagicMock()
-    mock_connect.return_value.__enter__.return_value = mock_conn
+    mock_conn = create_autospec(duckdb.DuckDBPyConnection, instance=True)
+    mock_connect.return_value.cursor.return_value.__enter__.return_value = mock_conn
     
     # Données de test
     test_data = [
@@ -156,15 +434,18 @@ def test_store_market_data(mock_connect):
     # Vérifications
     mock_connect.assert_called_once_with("test.duckdb")
     mock_conn.execute.assert_called()  # La requête SQL est exécutée
-    mock_conn.register.assert_called_once()  # Le DataFrame est enregistré
+    assert mock_conn.register.call_count == 2  # Les données, puis leur empreinte, sont enregistrées
+    assert mock_conn.unregister.call_count == 2  # Les tables Arrow sont libérées après l'insertion
+    insert_sql = next(c.args[0] for c in mock_conn.execute.call_args_list if "INSERT INTO crypto_market_data" in c.args[0])
+    assert "ON CONFLICT (id, date) DO UPDATE SET" in insert_sql  # Mise à jour en place des doublons
+    assert "price = EXCLUDED.price" in insert_sql
+    assert "id = EXCLUDED.id" not in insert_sql
 
+@patch.object(DuckDBResource, '_migrate_price_history_table')
 @patch('crypto_pipeline.resources.duckdb_resource.duckdb.connect')
-def test_store_price_history(mock_connect):
+@patch('crypto_pipeline.resources.duckdb_resource.pq.write_to_dataset')
+def test_store_price_history(mock_write, mock_connect, mock_migrate, tmp_path):
     """Teste la méthode store_price_history de DuckDBResource"""
-    # Configuration du mock
-    mock_conn = MagicMock()
-    mock_connect.return_value.__enter__.return_value = mock_conn
-    
     # Données de test
     test_data = {
         "prices": [[1617753600000, 50000], [1617840000000, 52000]],
@@ -173,10 +454,340 @@ def test_store_price_history(mock_connect):
     }
     
     # Test de la méthode
-    resource = DuckDBResource(database_path="test.duckdb")
+    price_history_path = str(tmp_path / "price_history")
+    resource = DuckDBResource(database_path="test.duckdb", price_history_path=price_history_path)
     resource.store_price_history("bitcoin", test_data)
     
     # Vérifications
+    mock_write.assert_called_once()  # Le dataset Parquet est écrit
+    assert mock_write.call_args.kwargs["root_path"] == price_history_path
+    assert mock_write.call_args.kwargs["partition_cols"] == ["dt", "id"]
+
+def test_store_price_histories(tmp_path, tmp_duckdb_resource):
+    """Teste le stockage groupé de l'historique des prix de plusieurs cryptomonnaies"""
+    # Données de test
+    test_data = [
+        {
+            "coin_id": "bitcoin",
+            "history": {
+                "prices": [[1617753600000, 50000], [1617840000000, 52000]],
+                "market_caps": [[1617753600000, 1000000000000], [1617840000000, 1050000000000]],
+                "total_volumes": [[1617753600000, 50000000000], [1617840000000, 52000000000]]
+            }
+        },
+        {
+            "coin_id": "ethereum",
+            "history": {
+                "prices": [[1617753600000, 3000]],
+                "market_caps": [[1617753600000, 400000000000]],
+                "total_volumes": [[1617753600000, 20000000000]]
+            }
+        }
+    ]
+    
+    # Test de la méthode
+    tmp_duckdb_resource.store_price_histories(test_data)
+    
+    # Vérifications : une partition par jour et par cryptomonnaie, relue via DuckDB
+    assert (tmp_path / "price_history" / "dt=2021-04-07" / "id=bitcoin").is_dir()
+    assert (tmp_path / "price_history" / "dt=2021-04-07" / "id=ethereum").is_dir()
+    history = tmp_duckdb_resource.get_coin_price_history("bitcoin")
+    assert history["price"].tolist() == [50000, 52000]
+    history = tmp_duckdb_resource.get_coin_price_history("bitcoin", start="2021-04-08", end="2021-05-01")
+    assert history["price"].tolist() == [52000]
+    history_table = tmp_duckdb_resource.get_coin_price_history_arrow("bitcoin")
+    assert isinstance(history_table, pa.Table)
+    assert history_table.column("price").to_pylist() == [50000, 52000]
+
+def test_store_unchanged_payloads_skipped(tmp_duckdb_resource):
+    """Teste que des données identiques à celles déjà stockées ne sont pas réécrites"""
+    history = {
+        "prices": [[1617753600000, 50000]],
+        "market_caps": [[1617753600000, 1000000000000]],
+        "total_volumes": [[1617753600000, 50000000000]]
+    }
+    market_data = [{"id": "bitcoin", "current_price": 50000, "market_cap": 1000000000000}]
+    tmp_duckdb_resource.store_price_history("bitcoin", history)
+    tmp_duckdb_resource.store_market_data(market_data, partition_date=date(2024, 1, 1))
+    with tmp_duckdb_resource._get_connection() as conn:
+        first_update = conn.execute("SELECT updated_at FROM crypto_market_data").fetchone()
+    
+    # Test des méthodes avec les mêmes données, puis avec un historique modifié
+    with patch('crypto_pipeline.resources.duckdb_resource.pq.write_to_dataset') as mock_write:
+        tmp_duckdb_resource.store_price_history("bitcoin", history)
+        tmp_duckdb_resource.store_market_data(market_data, partition_date=date(2024, 1, 1))
+        mock_write.assert_not_called()
+        tmp_duckdb_resource.store_price_history("bitcoin", {**history, "prices": [[1617753600000, 51000]]})
+        mock_write.assert_called_once()
+    
+    # Vérifications : la ligne de marché n'a pas été réécrite
+    with tmp_duckdb_resource._get_connection() as conn:
+        assert conn.execute("SELECT updated_at FROM crypto_market_data").fetchone() == first_update
+
+def test_store_price_history_rewritten_when_dataset_missing(tmp_path, tmp_duckdb_resource):
+    """Teste qu'un historique inchangé est réécrit si le dataset Parquet a disparu ou changé de chemin"""
+    history = {
+        "prices": [[1617753600000, 50000], [1617840000000, 52000]],
+        "market_caps": [[1617753600000, 1000000000000], [1617840000000, 1050000000000]],
+        "total_volumes": [[1617753600000, 50000000000], [1617840000000, 52000000000]]
+    }
+    tmp_duckdb_resource.store_price_history("bitcoin", history)
+    
+    # Test de la méthode : une partition supprimée, puis un nouveau chemin de dataset
+    shutil.rmtree(tmp_path / "price_history" / "dt=2021-04-08")
+    tmp_duckdb_resource.store_price_history("bitcoin", history)
+    moved = DuckDBResource(
+        database_path=tmp_duckdb_resource.database_path,
+        price_history_path=str(tmp_path / "moved_price_history")
+    )
+    try:
+        moved.store_price_history("bitcoin", history)
+        moved_prices = moved.get_coin_price_history("bitcoin")["price"].tolist()
+    finally:
+        moved.teardown_after_execution(build_init_resource_context())
+    
+    # Vérifications : les deux datasets contiennent l'historique complet
+    assert tmp_duckdb_resource.get_coin_price_history("bitcoin")["price"].tolist() == [50000, 52000]
+    assert moved_prices == [50000, 52000]
+
+def _hourly_history(start, end, price):
+    """Historique horaire au format CoinGecko sur la fenêtre [start, end)"""
+    timestamps = pd.date_range(start, end, freq="h", inclusive="left").as_unit("ms").asi8
+    points = [[int(ts), price] for ts in timestamps]
+    return {"prices": points, "market_caps": points, "total_volumes": points}
+
+def test_store_consecutive_partitions(tmp_duckdb_resource):
+    """Teste que le stockage de deux partitions journalières consécutives conserve les deux jours"""
+    # Test de la méthode : une fenêtre de partition après l'autre, comme le job d'historique
+    for partition_key, price in (("2024-03-04", 100.0), ("2024-03-05", 200.0)):
+        window = DAILY_PARTITIONS.time_window_for_partition_key(partition_key)
+        tmp_duckdb_resource.store_price_history("bitcoin", _hourly_history(window.start, window.end, price))
+    
+    # Vérifications : 24 points par jour, chacun dans sa partition dt=
+    history = tmp_duckdb_resource.get_coin_price_history("bitcoin")
+    assert len(history) == 48
+    assert history.groupby(history["timestamp"].dt.date)["price"].agg(["size", "first"]).values.tolist() == [
+        [24, 100.0], [24, 200.0]
+    ]
+
+def test_store_partial_day_keeps_existing_rows(tmp_duckdb_resource):
+    """Teste qu'une fenêtre qui ne couvre qu'une partie d'un jour ne tronque pas ce jour"""
+    tmp_duckdb_resource.store_price_history("bitcoin", _hourly_history("2024-03-04", "2024-03-05", 100.0))
+    
+    # Test de la méthode : fenêtre à l'heure de Paris, qui déborde de 1h sur la veille en UTC
+    tmp_duckdb_resource.store_price_history("bitcoin", _hourly_history("2024-03-04 23:00", "2024-03-05 23:00", 200.0))
+    
+    # Vérifications : la veille garde ses 23 premiers points, le point commun est remplacé
+    history = tmp_duckdb_resource.get_coin_price_history("bitcoin")
+    assert history["price"].tolist() == [100.0] * 23 + [200.0] * 24
+
+def test_legacy_price_history_table_migrated(tmp_duckdb_resource):
+    """Teste que les lignes de l'ancienne table crypto_price_history sont copiées dans le dataset Parquet"""
+    with duckdb.connect(tmp_duckdb_resource.database_path) as conn:
+        conn.execute("""
+            CREATE TABLE crypto_price_history (
+                id VARCHAR, timestamp TIMESTAMP, price DECIMAL(18, 8), market_cap DECIMAL(24, 8),
+                total_volume DECIMAL(24, 8), updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (id, timestamp)
+            );
+            INSERT INTO crypto_price_history (id, timestamp, price, market_cap, total_volume)
+            VALUES ('bitcoin', TIMESTAMP '2021-04-07 00:00:00', 50000, 1000000000000, 50000000000);
+        """)
+    
+    # Test de la méthode : la migration a lieu à la création des tables
+    tmp_duckdb_resource._ensure_tables()
+    
+    # Vérifications : l'historique est relu depuis le Parquet et l'ancienne table est supprimée
+    assert tmp_duckdb_resource.get_coin_price_history("bitcoin")["price"].tolist() == [50000.0]
+    with tmp_duckdb_resource._get_connection() as conn:
+        with pytest.raises(duckdb.CatalogException):
+            conn.execute("SELECT * FROM crypto_price_history")
+
+def test_store_price_history_repairs_truncated_partition(tmp_path, tmp_duckdb_resource):
+    """Teste qu'un historique inchangé est réécrit si sa partition Parquet a été tronquée"""
+    history = _hourly_history("2024-03-04", "2024-03-05", 100.0)
+    tmp_duckdb_resource.store_price_history("bitcoin", history)
+    
+    # Test de la méthode : la partition ne garde qu'une ligne, puis les mêmes données sont stockées
+    path, = (tmp_path / "price_history" / "dt=2024-03-04" / "id=bitcoin").glob("*.parquet")
+    pq.write_table(pq.read_table(path).slice(0, 1), path)
+    tmp_duckdb_resource.store_price_history("bitcoin", history)
+    
+    # Vérifications : les 24 points sont de nouveau présents
+    assert len(tmp_duckdb_resource.get_coin_price_history("bitcoin")) == 24
+
+def test_get_top_coins_with_history(tmp_duckdb_resource):
+    """Teste la récupération en une requête des top coins et de leur historique sur une période"""
+    tmp_duckdb_resource.create_tables()
+    tmp_duckdb_resource.store_coin_list([
+        {"id": "bitcoin", "symbol": "btc", "name": "Bitcoin"},
+        {"id": "ethereum", "symbol": "eth", "name": "Ethereum"},
+        {"id": "cardano", "symbol": "ada", "name": "Cardano"}
+    ])
+    tmp_duckdb_resource.store_market_data([
+        {"id": "bitcoin", "symbol": "btc", "name": "Bitcoin", "current_price": 50000, "market_cap": 1000000000000},
+        {"id": "ethereum", "symbol": "eth", "name": "Ethereum", "current_price": 3000, "market_cap": 400000000000},
+        {"id": "cardano", "symbol": "ada", "name": "Cardano", "current_price": 1, "market_cap": 30000000000}
+    ])
+    tmp_duckdb_resource.store_price_histories([
+        {
+            "coin_id": "bitcoin",
+            "history": {
+                "prices": [[1617753600000, 50000], [1617840000000, 52000]],
+                "market_caps": [[1617753600000, 1000000000000], [1617840000000, 1050000000000]],
+                "total_volumes": [[1617753600000, 50000000000], [1617840000000, 52000000000]]
+            }
+        }
+    ])
+    
+    # Test de la méthode
+    result = tmp_duckdb_resource.get_top_coins_with_history(2, date(2021, 4, 1), date(2021, 5, 1))
+    
+    # Vérifications : cardano est exclu, ethereum apparaît sans historique
+    assert result["id"].tolist() == ["bitcoin", "bitcoin", "ethereum"]
+    assert result["hist_price"].tolist()[:2] == [50000, 52000]
+    assert pd.isna(result["timestamp"].iloc[2])
+
+def test_get_top_coins_latest_date(tmp_duckdb_resource):
+    """Teste que seules les données de marché de la dernière date sont classées"""
+    tmp_duckdb_resource.create_tables()
+    tmp_duckdb_resource.store_coin_list([
+        {"id": "bitcoin", "symbol": "btc", "name": "Bitcoin"},
+        {"id": "ethereum", "symbol": "eth", "name": "Ethereum"}
+    ])
+    tmp_duckdb_resource.store_market_data([
+        {"id": "bitcoin", "current_price": 50000, "market_cap": 1000000000000},
+        {"id": "ethereum", "current_price": 3000, "market_cap": 400000000000}
+    ], partition_date=date(2024, 1, 2))
+    tmp_duckdb_resource.store_market_data([
+        {"id": "ethereum", "current_price": 3100, "market_cap": 2000000000000}
+    ], partition_date=date(2024, 1, 1))
+    
+    # Test de la méthode
+    result = tmp_duckdb_resource.get_top_coins(1)
+    
+    # Vérifications : l'ancienne capitalisation d'ethereum est ignorée, les données
+    # sont rattachées à leur date de partition
+    assert result["id"].tolist() == ["bitcoin"]
+    with tmp_duckdb_resource._get_connection() as conn:
+        dates = conn.execute("SELECT DISTINCT date FROM crypto_market_data ORDER BY date").fetchall()
+    assert dates == [(date(2024, 1, 1),), (date(2024, 1, 2),)]
+
+def test_get_top_coins_empty_table(tmp_duckdb_resource):
+    """Teste le résultat vide, sans requête de comptage, lorsque la table de marché est vide"""
+    tmp_duckdb_resource.create_tables()
+    
+    # Test de la méthode
+    result = tmp_duckdb_resource.get_top_coins(5)
+    
+    # Vérifications
+    assert result.empty
+    assert result.columns.tolist() == ["id", "name", "price", "market_cap", "price_change_percentage_24h"]
+
+def test_get_top_coins_without_tables(tmp_duckdb_resource):
+    """Teste le DataFrame vide retourné, sans sonde du catalogue, lorsque les tables n'existent pas"""
+    
+    # Test des méthodes
+    top_coins = tmp_duckdb_resource.get_top_coins(5)
+    top_coins_with_history = tmp_duckdb_resource.get_top_coins_with_history(5, date(2024, 1, 1), date(2024, 2, 1))
+    
+    # Vérifications : colonnes typées, copies des DataFrames partagés
+    assert top_coins.empty
+    assert top_coins["price"].dtype == "float64"
+    assert top_coins is not EMPTY_TOP_COINS
+    assert top_coins_with_history.empty
+    assert "hist_price" in top_coins_with_history.columns
+
+def test_get_coin_price_history_without_dataset(tmp_duckdb_resource):
+    """Teste le DataFrame vide retourné lorsque l'historique des prix n'existe pas encore"""
+    
+    # Test de la méthode
+    result = tmp_duckdb_resource.get_coin_price_history("bitcoin")
+    
+    # Vérifications : colonnes typées, copie du DataFrame partagé
+    assert result.empty
+    assert result["price"].dtype == "float64"
+    assert result is not EMPTY_PRICE_HISTORY
+    assert tmp_duckdb_resource.get_coin_price_history_arrow("bitcoin").num_rows == 0
+
+def test_to_arrow_table_columnwise():
+    """Teste la construction colonne par colonne d'une table Arrow typée"""
+    # Test de la fonction
+    table = to_arrow_table(
+        [{"id": "bitcoin", "current_price": 50000, "extra": "ignoré"}, {"id": "ethereum"}],
+        MARKET_DATA_SCHEMA
+    )
+    
+    # Vérifications : schéma respecté, colonnes absentes à null, colonnes inconnues ignorées
+    assert table.schema == MARKET_DATA_SCHEMA
+    assert table.column("current_price").to_pylist() == [50000.0, None]
+    assert table.column("symbol").null_count == 2
+    assert to_arrow_table(table, MARKET_DATA_SCHEMA) is table
+
+@patch.object(DuckDBResource, '_migrate_price_history_table')
+@patch('crypto_pipeline.resources.duckdb_resource.duckdb.connect')
+def test_duckdb_connection_reused(mock_connect, mock_migrate):
+    """Teste qu'une seule connexion est ouverte et fermée à la fin de l'exécution"""
+    @asset
+    def coins(duckdb_resource: DuckDBResource) -> None:
+        duckdb_resource.store_coin_list([{"id": "bitcoin", "symbol": "btc", "name": "Bitcoin"}])
+    
+    # Test de la ressource dans une vraie exécution Dagster (setup et teardown appelés par Dagster)
+    result = materialize(
+        [coins],
+        resources={"duckdb_resource": DuckDBResource(database_path="test.duckdb", threads=2)}
+    )
+    
+    # Vérifications : un curseur par appel sur la même connexion, fermée par Dagster
     mock_connect.assert_called_once_with("test.duckdb")
-    mock_conn.execute.assert_called()  # La requête SQL est exécutée
-    mock_conn.register.assert_called_once()  # Le DataFrame est enregistré 
\ No newline at end of file
+    mock_connect.return_value.execute.assert_any_call("PRAGMA preserve_insertion_order=false")
+    mock_connect.return_value.execute.assert_any_call("PRAGMA threads=2")
+    assert mock_connect.return_value.cursor.call_count == 2
+    mock_connect.return_value.close.assert_called_once()
+    assert result.success
+
+@patch.object(DuckDBResource, 'create_tables')
+@patch('crypto_pipeline.resources.duckdb_resource.duckdb.connect')
+def test_duckdb_reader_runs_no_ddl(mock_connect, mock_create_tables):
+    """Teste qu'une étape qui ne fait que lire la base ne crée pas les tables"""
+    @asset
+    def top_coins(duckdb_resource: DuckDBResource) -> None:
+        duckdb_resource.get_top_coins(10)
+    
+    # Test de la ressource dans une vraie exécution Dagster
+    result = materialize([top_coins], resources={"duckdb_resource": DuckDBResource(database_path="test.duckdb")})
+    
+    # Vérifications
+    mock_create_tables.assert_not_called()
+    assert result.success
+
+@patch.object(DuckDBResource, '_migrate_price_history_table')
+@patch('crypto_pipeline.resources.duckdb_resource.duckdb.connect')
+def test_duckdb_store_skips_ddl_once_tables_ready(mock_connect, mock_migrate):
+    """Teste que les stockages successifs ne relancent pas les CREATE TABLE"""
+    mock_conn = create_autospec(duckdb.DuckDBPyConnection, instance=True)
+    mock_connect.return_value.cursor.return_value.__enter__.return_value = mock_conn
+    
+    # Test de la méthode
+    resource = DuckDBResource(database_path="test.duckdb")
+    resource.store_coin_list([{"id": "bitcoin", "symbol": "btc", "name": "Bitcoin"}])
+    resource.store_coin_list([{"id": "ethereum", "symbol": "eth", "name": "Ethereum"}])
+    
+    # Vérifications : DDL exécuté une seule fois
+    ddl_calls = [c for c in mock_conn.execute.call_args_list if "CREATE TABLE" in c.args[0]]
+    assert len(ddl_calls) == 1
+
+# Tests pour ParquetIOManager
+def test_parquet_io_manager_roundtrip(tmp_path):
+    """Teste l'écriture puis la relecture d'une table Arrow par le ParquetIOManager"""
+    table = pa.table({"id": ["bitcoin", "ethereum"], "symbol": ["btc", "eth"]})
+    io_manager = ParquetIOManagerFactory(base_path=str(tmp_path)).create_io_manager(None)
+    path = UPath(tmp_path) / "crypto_coins_list.parquet"
+    
+    # Test des méthodes
+    io_manager.dump_to_path(None, table, path)
+    result = io_manager.load_from_path(None, path)
+    
+    # Vérifications
+    assert path.exists()
+    assert result.equals(table)
@@ -0,0 +1,197 @@
+"""
+Tests unitaires pour les utilitaires de visualisation.
+"""
+
+import pytest
+import numpy as np
+import pandas as pd
+import matplotlib
+from matplotlib.colors import to_rgba
+from unittest.mock import patch
+from crypto_pipeline.utils import visualization
+from crypto_pipeline.utils.visualization import (
+    MAX_PLOT_POINTS,
+    _decimation_step,
+    _normalize,
+    _normalize_numpy,
+    create_comparison_chart,
+    create_market_overview,
+    create_market_overview_from_duckdb,
+    create_price_chart,
+    render_batch,
+)
+
+@pytest.fixture
+def price_data():
+    """Historique de prix journalier sur 60 jours"""
+    return pd.DataFrame({
+        'timestamp': pd.date_range("2024-01-01", periods=60, freq="D"),
+        'price': np.linspace(40000.0, 45000.0, 60),
+        'total_volume': np.arange(60, dtype=np.float64),
+    })
+
+@pytest.fixture
+def market_data():
+    """Données de marché de 5 cryptomonnaies"""
+    return pd.DataFrame({
+        'name': ["Bitcoin", "Ethereum", "Tether", "Solana", "XRP"],
+        'market_cap': [8.5e11, 3.9e11, 1.1e11, 7.0e10, 3.0e10],
+        'price_change_percentage_24h': [1.5, -2.0, 0.0, 4.2, -0.7],
+    })
+
+def test_normalize_numpy_base_100():
+    """Teste la normalisation de référence en base 100 à la première valeur"""
+    values = np.array([50.0, 75.0, 25.0])
+    
+    # Vérifications
+    np.testing.assert_allclose(_normalize_numpy(values), [100.0, 150.0, 50.0])
+
+def test_normalize_readonly_column():
+    """Teste la normalisation d'une colonne pandas en lecture seule, décimée par pas régulier"""
+    df = pd.DataFrame({'price': np.linspace(10.0, 20.0, 100)})
+    values = df['price'].to_numpy(dtype=np.float64, copy=False)[::3]
+    values.flags.writeable = False
+    
+    # Vérifications
+    np.testing.assert_allclose(_normalize(values), _normalize_numpy(values))
+
+def test_normalize_numba_matches_numpy():
+    """Teste le noyau numba contre la normalisation de référence, sur des tableaux en lecture seule ou non"""
+    pytest.importorskip("numba")
+    readonly = np.linspace(1.0, 2.0, 101)
+    readonly.flags.writeable = False
+    
+    # Vérifications : tableaux modifiables, en lecture seule, contigus ou décimés
+    for values in (np.linspace(1.0, 2.0, 101), readonly, readonly[::2]):
+        np.testing.assert_allclose(_normalize(values), _normalize_numpy(values))
+
+@pytest.fixture
+def saved_figure():
+    """Intercepte _save_png (sans empêcher l'écriture) pour inspecter la figure rendue"""
+    with patch.object(visualization, "_save_png", wraps=visualization._save_png) as mock_save:
+        yield lambda: mock_save.call_args.args[0]
+
+@pytest.mark.parametrize("length,step", [
+    (10, 1),
+    (MAX_PLOT_POINTS, 1),
+    (2 * MAX_PLOT_POINTS - 1, 1),
+    (2 * MAX_PLOT_POINTS, 2),
+    (3 * MAX_PLOT_POINTS + 1, 3),
+])
+def test_decimation_step(length, step):
+    """Teste le pas de décimation des longues séries"""
+    assert _decimation_step(length) == step
+
+def test_price_chart_decimated_volumes(tmp_path, saved_figure):
+    """Teste que les longues séries sont décimées et les volumes cumulés par intervalle"""
+    length = 3 * MAX_PLOT_POINTS
+    price_data = pd.DataFrame({
+        'timestamp': pd.date_range("2024-01-01", periods=length, freq="min"),
+        'price': np.arange(length, dtype=np.float64),
+        'total_volume': np.ones(length),
+    })
+    
+    output_path = create_price_chart(price_data, "Bitcoin", output_path=str(tmp_path / "price.png"))
+    ax_price, ax_volume = saved_figure().axes
+    
+    # Vérifications : un point sur trois tracé, chaque barre cumule trois volumes
+    assert output_path == str(tmp_path / "price.png")
+    assert (tmp_path / "price.png").stat().st_size > 0
+    np.testing.assert_array_equal(ax_price.lines[0].get_ydata(), np.arange(0, length, 3))
+    heights = [bar.get_height() for bar in ax_volume.patches]
+    assert len(heights) == MAX_PLOT_POINTS
+    assert set(heights) == {3.0}
+    assert sum(heights) == length
+
+def test_comparison_chart_normalized(tmp_path, saved_figure, price_data):
+    """Teste que chaque série est tracée en base 100 à sa première valeur"""
+    create_comparison_chart(
+        {"Bitcoin": price_data, "Ethereum": price_data.assign(price=price_data['price'] / 20)},
+        output_path=str(tmp_path / "comparison.png")
+    )
+    (ax,) = saved_figure().axes
+    
+    # Vérifications
+    expected = _normalize_numpy(price_data['price'].to_numpy())
+    for line in ax.lines:
+        np.testing.assert_allclose(line.get_ydata(), expected)
+    assert [text.get_text() for text in ax.get_legend().get_texts()] == ["Bitcoin", "Ethereum"]
+
+def test_market_overview_positions_and_labels(tmp_path, saved_figure, market_data):
+    """Teste que les barres sont placées sur des positions entières, étiquetées par nom et triées"""
+    create_market_overview(market_data.iloc[::-1], output_path=str(tmp_path / "overview.png"), top_n=3)
+    ax_cap, ax_change = saved_figure().axes
+    
+    # Vérifications : les 3 plus grandes capitalisations, la plus grande en haut
+    for ax in (ax_cap, ax_change):
+        assert list(ax.get_yticks()) == [0, 1, 2]
+        assert [label.get_text() for label in ax.get_yticklabels()] == ["Bitcoin", "Ethereum", "Tether"]
+        assert ax.yaxis_inverted()
+    assert [bar.get_width() for bar in ax_cap.patches] == pytest.approx([850.0, 390.0, 110.0])
+    assert [bar.get_facecolor() for bar in ax_change.patches] == [to_rgba('g'), to_rgba('r'), to_rgba('g')]
+
+def test_chart_rc_params_scoped(tmp_path, market_data):
+    """Teste que la simplification des tracés ne s'applique que pendant la construction des graphiques"""
+    thresholds = []
+    
+    # Test de la méthode : seuil relevé au moment du rendu
+    with patch.object(visualization, "_save_png", side_effect=lambda *args: thresholds.append(
+        matplotlib.rcParams['path.simplify_threshold']
+    )):
+        create_market_overview(market_data, output_path=str(tmp_path / "overview.png"))
+    
+    # Vérifications : rcParams du processus inchangés après l'import et le rendu
+    assert thresholds == [1.0]
+    assert matplotlib.rcParams['path.simplify_threshold'] == matplotlib.rcParamsDefault['path.simplify_threshold']
+
+def test_market_overview_from_duckdb(tmp_path, saved_figure, tmp_duckdb_resource):
+    """Teste l'aperçu du marché construit à partir des N premières lignes lues dans DuckDB"""
+    tmp_duckdb_resource.create_tables()
+    tmp_duckdb_resource.store_coin_list([
+        {"id": "bitcoin", "symbol": "btc", "name": "Bitcoin"},
+        {"id": "ethereum", "symbol": "eth", "name": "Ethereum"},
+        {"id": "cardano", "symbol": "ada", "name": "Cardano"}
+    ])
+    tmp_duckdb_resource.store_market_data([
+        {"id": "cardano", "symbol": "ada", "name": "Cardano", "current_price": 1, "market_cap": 30000000000, "price_change_percentage_24h": -1.0},
+        {"id": "bitcoin", "symbol": "btc", "name": "Bitcoin", "current_price": 50000, "market_cap": 1000000000000, "price_change_percentage_24h": 2.0},
+        {"id": "ethereum", "symbol": "eth", "name": "Ethereum", "current_price": 3000, "market_cap": 400000000000, "price_change_percentage_24h": 0.5}
+    ])
+    
+    output_path = create_market_overview_from_duckdb(tmp_duckdb_resource, output_path=str(tmp_path / "overview.png"), top_n=2)
+    ax_cap, _ = saved_figure().axes
+    
+    # Vérifications
+    assert output_path == str(tmp_path / "overview.png")
+    assert (tmp_path / "overview.png").stat().st_size > 0
+    assert [label.get_text() for label in ax_cap.get_yticklabels()] == ["Bitcoin", "Ethereum"]
+    assert [bar.get_width() for bar in ax_cap.patches] == pytest.approx([1000.0, 400.0])
+
+def test_render_batch_after_parent_render(tmp_path, price_data, market_data):
+    """Teste que render_batch écrit tous les graphiques, même après un rendu dans le processus parent"""
+    # Un premier graphique rendu dans ce processus (pool de figures déjà rempli)
+    create_price_chart(price_data, "Bitcoin", output_path=str(tmp_path / "parent.png"))
+    
+    jobs = [
+        (create_market_overview, {"market_data": market_data, "output_path": str(tmp_path / "overview.png")}),
+        (create_price_chart, {"price_data": price_data, "coin_name": "Bitcoin", "output_path": str(tmp_path / "price.png")}),
+    ]
+    paths = render_batch(jobs, max_workers=2)
+    
+    # Vérifications : chemins dans l'ordre des jobs, fichiers PNG complets au retour
+    assert paths == [str(tmp_path / "overview.png"), str(tmp_path / "price.png")]
+    for path in paths:
+        with open(path, "rb") as f:
+            assert f.read(8) == b"\x89PNG\r\n\x1a\n"
+
+def test_render_batch_single_job_inline(tmp_path, monkeypatch, market_data):
+    """Teste qu'un seul job est rendu dans le processus courant"""
+    output_path = str(tmp_path / "overview.png")
+    
+    # Aucun processus ne doit être démarré pour un seul graphique
+    monkeypatch.setattr("crypto_pipeline.utils.visualization.ProcessPoolExecutor", None)
+    paths = render_batch([(create_market_overview, {"market_data": market_data, "output_path": output_path})])
+    
+    # Vérifications
+    assert paths == [output_path]
+    assert (tmp_path / "overview.png").stat().st_size > 0
@@ -3,12 +3,113 @@ Utilitaires pour la visualisation des données de cryptomonnaies.
 """
 
 import os
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
+import matplotlib
 import matplotlib.dates as mdates
-from typing import List, Dict, Any, Optional
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from PIL import Image
+from typing import TYPE_CHECKING, Callable, List, Dict, Any, Optional, Tuple
 from datetime import datetime
 
+if TYPE_CHECKING:
+    from crypto_pipeline.resources.duckdb_resource import DuckDBResource
+
+try:
+    from numba import njit, types as nb_types
+except ImportError:  # numba est facultatif : repli sur NumPy
+    njit = None
+
+# Les figures sont créées avec l'API objet et attachées à un canevas Agg (_get_fig) :
+# aucun backend n'est sélectionné et pyplot n'est pas utilisé, l'import de ce module ne
+# modifie ni le backend ni les rcParams du processus.
+
+# Simplification maximale des tracés (les segments indiscernables à l'écran sont
+# fusionnés), appliquée uniquement pendant la construction des graphiques de ce module
+_CHART_RC = {'path.simplify': True, 'path.simplify_threshold': 1.0}
+
+# Résolution par défaut des graphiques : suffisante pour un tableau de bord,
+# le temps d'encodage PNG et la taille des fichiers croissent avec dpi²
+DEFAULT_DPI = 120
+
+# Compression zlib rapide : fichiers un peu plus gros, encodage nettement plus court
+PNG_SAVE_OPTIONS = {"compress_level": 1}
+
+# Format des dates partagé par tous les axes : il ne dépend que du format, pas de l'axe.
+# Les DayLocator restent créés par axe, car ils calculent les graduations à partir
+# des limites de l'axe auquel ils sont attachés.
+_DATE_FMT = mdates.DateFormatter('%d/%m/%Y')
+
+# Nombre maximal de points tracés par série : un axe d'environ 1 200 pixels de large
+# ne peut pas en distinguer davantage
+MAX_PLOT_POINTS = 1500
+
+def _decimation_step(length: int, target: int = MAX_PLOT_POINTS) -> int:
+    """
+    Pas d'échantillonnage ramenant une série de `length` points à environ `target` points.
+    """
+    return max(1, length // target)
+
+def _normalize_numpy(values: np.ndarray) -> np.ndarray:
+    """
+    Ramène une série en base 100 à sa première valeur (non nulle), en un seul passage.
+    """
+    return values * (100.0 / values[0])
+
+if njit is not None:
+    # Noyau compilé en code natif dès l'import grâce à la signature explicite (pas de
+    # compilation au premier appel) ; cache=True conserve le code compilé sur disque
+    # entre les processus, dans NUMBA_CACHE_DIR si cette variable est définie.
+    # L'argument est déclaré en lecture seule et de disposition quelconque : les colonnes
+    # pandas (copy-on-write) sont en lecture seule et la décimation les rend non contiguës ;
+    # les tableaux modifiables s'y convertissent sans copie.
+    _NORMALIZE_SIGNATURE = nb_types.float64[:](nb_types.Array(nb_types.float64, 1, "A", readonly=True))
+    _normalize = njit(_NORMALIZE_SIGNATURE, cache=True, fastmath=True)(_normalize_numpy)
+else:
+    _normalize = _normalize_numpy
+
+# Figures réutilisées d'un appel à l'autre, indexées par leur disposition :
+# le canevas Agg et les axes ne sont alloués qu'une fois par forme de figure
+_FIG_POOL: Dict[tuple, Figure] = {}
+
+def _get_fig(nrows: int, ncols: int, figsize: Tuple[int, int], height_ratios: Optional[Tuple[int, ...]] = None) -> Tuple[Figure, list]:
+    """
+    Retourne la figure du pool correspondant à cette disposition, avec ses axes vidés.
+    
+    Args:
+        nrows: Nombre de lignes de sous-graphiques.
+        ncols: Nombre de colonnes de sous-graphiques.
+        figsize: Taille de la figure en pouces.
+        height_ratios: Hauteurs relatives des lignes (facultatif).
+        
+    Returns:
+        La figure et la liste de ses axes.
+    """
+    key = (nrows, ncols, figsize, height_ratios)
+    fig = _FIG_POOL.get(key)
+    if fig is None:
+        fig = Figure(figsize=figsize)
+        FigureCanvasAgg(fig)  # Canevas Agg attaché : son tampon de pixels est relu par _save_png
+        fig.subplots(nrows, ncols, gridspec_kw={'height_ratios': list(height_ratios)} if height_ratios else None)
+        _FIG_POOL[key] = fig
+    for ax in fig.axes:
+        ax.clear()
+    return fig, fig.axes
+
+def _save_png(fig: Figure, output_path: str, dpi: int) -> None:
+    """
+    Dessine la figure à la résolution demandée et écrit son tampon RGBA en PNG.
+    """
+    fig.set_dpi(dpi)
+    fig.canvas.draw()
+    # Tampon Agg encodé directement par Pillow (sans copie), avant tout nouveau dessin de la figure
+    Image.fromarray(np.asarray(fig.canvas.buffer_rgba()), "RGBA").save(
+        output_path, format="PNG", dpi=(dpi, dpi), **PNG_SAVE_OPTIONS
+    )
+
 def ensure_visualization_dir(base_dir: str = "crypto_pipeline/data") -> str:
     """
     S'assure que le répertoire de visualisation existe.
@@ -23,12 +124,14 @@ def ensure_visualization_dir(base_dir: str = "crypto_pipeline/data") -> str:
     os.makedirs(vis_dir, exist_ok=True)
     return vis_dir
 
+@matplotlib.rc_context(_CHART_RC)
 def create_price_chart(
     price_data: pd.DataFrame,
     coin_name: str,
     output_path: Optional[str] = None,
     days: int = 30,
-    show_volume: bool = True
+    show_volume: bool = True,
+    dpi: int = DEFAULT_DPI
 ) -> str:
     """
     Crée un graphique d'évolution des prix pour une cryptomonnaie.
@@ -39,36 +142,47 @@ def create_price_chart(
         output_path: Chemin de sortie pour le graphique (facultatif).
         days: Nombre de jours à afficher dans le titre.
         show_volume: Indique si le volume doit être affiché.
+        dpi: Résolution du fichier PNG.
         
     Returns:
         Chemin du fichier graphique créé.
     """
-    # Créer une figure avec deux sous-graphiques si l'affichage du volume est demandé
-    if show_volume and 'total_volume' in price_data.columns:
-        fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(12, 8), gridspec_kw={'height_ratios': [3, 1]})
+    # Utiliser une figure avec deux sous-graphiques si l'affichage du volume est demandé
+    show_volume = show_volume and 'total_volume' in price_data.columns
+    if show_volume:
+        fig, (ax1, ax2) = _get_fig(2, 1, (12, 8), height_ratios=(3, 1))
     else:
-        fig, ax1 = plt.subplots(figsize=(12, 6))
+        fig, (ax1,) = _get_fig(1, 1, (12, 6))
+    
+    # Colonnes converties une fois en tableaux NumPy, tracés sans passer par les Series,
+    # puis décimées par pas régulier pour les longues séries
+    step = _decimation_step(len(price_data))
+    timestamps = price_data['timestamp'].to_numpy()[::step]
     
     # Formater l'axe des dates
-    ax1.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m/%Y'))
+    ax1.xaxis.set_major_formatter(_DATE_FMT)
     ax1.xaxis.set_major_locator(mdates.DayLocator(interval=5))
     
     # Tracer le graphique de prix
-    ax1.plot(price_data['timestamp'], price_data['price'], 'b-', linewidth=2)
+    ax1.plot(timestamps, price_data['price'].to_numpy()[::step], 'b-', linewidth=2)
     ax1.set_title(f"Évolution du prix de {coin_name} sur {days} jours", fontsize=16)
     ax1.set_ylabel('Prix (USD)', fontsize=12)
     ax1.grid(True, linestyle='--', alpha=0.7)
     
     # Tracer le volume si demandé
-    if show_volume and 'total_volume' in price_data.columns and 'ax2' in locals():
-        ax2.bar(price_data['timestamp'], price_data['total_volume'], color='gray', alpha=0.5)
+    if show_volume:
+        # Volumes cumulés sur chaque intervalle de la grille décimée
+        volumes = price_data['total_volume'].to_numpy()
+        if step > 1:
+            volumes = np.add.reduceat(volumes, np.arange(0, len(volumes), step))
+        ax2.bar(timestamps, volumes, color='gray', alpha=0.5)
         ax2.set_ylabel('Volume', fontsize=12)
         ax2.grid(True, linestyle='--', alpha=0.7)
-        ax2.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m/%Y'))
+        ax2.xaxis.set_major_formatter(_DATE_FMT)
         ax2.xaxis.set_major_locator(mdates.DayLocator(interval=5))
     
-    plt.xticks(rotation=45)
-    plt.tight_layout()
+    fig.axes[-1].tick_params(axis='x', labelrotation=45)
+    fig.tight_layout()  # Mise en page calculée une fois (pas de bbox_inches='tight', qui redessine la figure)
     
     # Déterminer le chemin de sortie
     if output_path is None:
@@ -77,17 +191,18 @@ def create_price_chart(
         output_path = os.path.join(vis_dir, filename)
     
     # Sauvegarder le graphique
-    plt.savefig(output_path, dpi=300, bbox_inches='tight')
-    plt.close(fig)
+    _save_png(fig, output_path, dpi)
     
     return output_path
 
+@matplotlib.rc_context(_CHART_RC)
 def create_comparison_chart(
     coins_data: Dict[str, pd.DataFrame],
     metric: str = 'price',
     title: str = "Comparaison des cryptomonnaies",
     output_path: Optional[str] = None,
-    normalize: bool = True
+    normalize: bool = True,
+    dpi: int = DEFAULT_DPI
 ) -> str:
     """
     Crée un graphique comparatif pour plusieurs cryptomonnaies.
@@ -98,23 +213,27 @@ def create_comparison_chart(
         title: Titre du graphique.
         output_path: Chemin de sortie pour le graphique (facultatif).
         normalize: Indique si les valeurs doivent être normalisées pour une meilleure comparaison.
+        dpi: Résolution du fichier PNG.
         
     Returns:
         Chemin du fichier graphique créé.
     """
-    fig, ax = plt.subplots(figsize=(12, 8))
+    fig, (ax,) = _get_fig(1, 1, (12, 8))
     
     for coin_name, df in coins_data.items():
         if metric not in df.columns:
             continue
-            
-        # Normaliser les valeurs si demandé
-        if normalize and len(df) > 0:
-            first_value = df[metric].iloc[0]
-            values = df[metric] / first_value * 100 if first_value != 0 else df[metric]
-            ax.plot(df['timestamp'], values, linewidth=2, label=coin_name)
-        else:
-            ax.plot(df['timestamp'], df[metric], linewidth=2, label=coin_name)
+        
+        step = _decimation_step(len(df))
+        timestamps = df['timestamp'].to_numpy()[::step]
+        values = df[metric].to_numpy(dtype=np.float64, copy=False)[::step]
+        
+        # Normaliser les valeurs si demandé (base 100 à la première valeur)
+        if normalize and len(values) > 0:
+            first_value = values[0]
+            if first_value != 0:
+                values = _normalize(values)
+        ax.plot(timestamps, values, linewidth=2, label=coin_name)
     
     # Formater le graphique
     if normalize:
@@ -126,11 +245,11 @@ def create_comparison_chart(
     ax.set_title(title, fontsize=16)
     ax.grid(True, linestyle='--', alpha=0.7)
     ax.legend(loc='best', fontsize=10)
-    ax.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m/%Y'))
+    ax.xaxis.set_major_formatter(_DATE_FMT)
     ax.xaxis.set_major_locator(mdates.DayLocator(interval=5))
     
-    plt.xticks(rotation=45)
-    plt.tight_layout()
+    ax.tick_params(axis='x', labelrotation=45)
+    fig.tight_layout()  # Mise en page calculée une fois (pas de bbox_inches='tight', qui redessine la figure)
     
     # Déterminer le chemin de sortie
     if output_path is None:
@@ -139,15 +258,16 @@ def create_comparison_chart(
         output_path = os.path.join(vis_dir, filename)
     
     # Sauvegarder le graphique
-    plt.savefig(output_path, dpi=300, bbox_inches='tight')
-    plt.close(fig)
+    _save_png(fig, output_path, dpi)
     
     return output_path
 
+@matplotlib.rc_context(_CHART_RC)
 def create_market_overview(
     market_data: pd.DataFrame,
     output_path: Optional[str] = None,
-    top_n: int = 10
+    top_n: int = 10,
+    dpi: int = DEFAULT_DPI
 ) -> str:
     """
     Crée un aperçu du marché des cryptomonnaies sous forme de visualisation.
@@ -156,30 +276,41 @@ def create_market_overview(
         market_data: DataFrame contenant les données de marché.
         output_path: Chemin de sortie pour le graphique (facultatif).
         top_n: Nombre de cryptomonnaies à inclure dans l'aperçu.
+        dpi: Résolution du fichier PNG.
         
     Returns:
         Chemin du fichier graphique créé.
     """
     # Filtrer les N principales cryptomonnaies par capitalisation boursière
-    top_coins = market_data.sort_values('market_cap', ascending=False).head(top_n)
+    # (sélection partielle, sans trier tout le DataFrame)
+    top_coins = market_data.nlargest(top_n, 'market_cap')
     
-    # Créer une figure avec des sous-graphiques
-    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(15, 8))
+    # Réutiliser une figure avec deux sous-graphiques
+    fig, (ax1, ax2) = _get_fig(1, 2, (15, 8))
+    
+    # Colonnes extraites une fois en tableaux NumPy ; les barres sont placées sur des
+    # positions entières et les noms posés comme étiquettes (pas d'axe catégoriel)
+    names = top_coins['name'].to_numpy()
+    pct_change = top_coins['price_change_percentage_24h'].to_numpy()
+    market_cap_bn = top_coins['market_cap'].to_numpy() * 1e-9
+    y = np.arange(len(names))
     
     # Graphique 1: Capitalisation boursière
-    ax1.barh(top_coins['name'], top_coins['market_cap'] / 1e9)
+    ax1.barh(y, market_cap_bn)
+    ax1.set_yticks(y, labels=names)
     ax1.set_title("Top Capitalisation Boursière (Milliards USD)")
     ax1.set_xlabel("Capitalisation (Milliards USD)")
     ax1.invert_yaxis()  # Pour que le plus grand soit en haut
     
     # Graphique 2: Variation de prix sur 24h
-    colors = ['g' if x >= 0 else 'r' for x in top_coins['price_change_percentage_24h']]
-    ax2.barh(top_coins['name'], top_coins['price_change_percentage_24h'], color=colors)
+    colors = np.where(pct_change >= 0, 'g', 'r')
+    ax2.barh(y, pct_change, color=colors)
+    ax2.set_yticks(y, labels=names)
     ax2.set_title("Variation de Prix sur 24h (%)")
     ax2.set_xlabel("Variation (%)")
     ax2.invert_yaxis()  # Pour maintenir le même ordre que le premier graphique
     
-    plt.tight_layout()
+    fig.tight_layout()  # Mise en page calculée une fois (pas de bbox_inches='tight', qui redessine la figure)
     
     # Déterminer le chemin de sortie
     if output_path is None:
@@ -188,7 +319,59 @@ def create_market_overview(
         output_path = os.path.join(vis_dir, filename)
     
     # Sauvegarder le graphique
-    plt.savefig(output_path, dpi=300, bbox_inches='tight')
-    plt.close(fig)
+    _save_png(fig, output_path, dpi)
+    
+    return output_path 
+
+def create_market_overview_from_duckdb(
+    duckdb_resource: "DuckDBResource",
+    output_path: Optional[str] = None,
+    top_n: int = 10,
+    dpi: int = DEFAULT_DPI
+) -> str:
+    """
+    Crée l'aperçu du marché directement à partir de la base DuckDB.
+    
+    La sélection des N principales cryptomonnaies est faite par DuckDB
+    (ORDER BY market_cap DESC LIMIT N, tri partiel) : seules ces N lignes sont
+    chargées en mémoire, au lieu de tout le marché.
+    
+    La base est ouverte par le processus appelant : dans un asset Dagster, celui-ci
+    doit appartenir au pool duckdb_writer (DUCKDB_WRITER_POOL), comme les autres lecteurs.
+    
+    Args:
+        duckdb_resource: Ressource DuckDB contenant les données de marché.
+        output_path: Chemin de sortie pour le graphique (facultatif).
+        top_n: Nombre de cryptomonnaies à inclure dans l'aperçu.
+        dpi: Résolution du fichier PNG.
+        
+    Returns:
+        Chemin du fichier graphique créé.
+    """
+    top_coins = duckdb_resource.get_top_coins(top_n)
+    return create_market_overview(top_coins, output_path=output_path, top_n=top_n, dpi=dpi)
+
+def render_batch(jobs: List[Tuple[Callable[..., str], Dict[str, Any]]], max_workers: Optional[int] = None) -> List[str]:
+    """
+    Génère plusieurs graphiques indépendants en parallèle, un processus par cœur.
+    
+    Le rendu Agg est limité par le CPU et matplotlib n'est pas thread-safe : chaque
+    graphique est donc produit dans un processus distinct (canevas Agg attaché à chaque
+    figure, quel que soit le backend du processus). Les processus sont démarrés par « spawn » : un fork hériterait de
+    l'état de matplotlib et des verrous des threads du processus parent.
+    
+    Args:
+        jobs: Liste de couples (fonction create_*, arguments nommés).
+        max_workers: Nombre maximal de processus (par défaut : nombre de cœurs).
+        
+    Returns:
+        Chemins des fichiers graphiques créés, dans l'ordre des jobs.
+    """
+    if len(jobs) <= 1:
+        # Inutile de démarrer des processus pour un seul graphique
+        return [func(**kwargs) for func, kwargs in jobs]
     
-    return output_path 
\ No newline at end of file
+    max_workers = min(len(jobs), max_workers or os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        futures = [executor.submit(func, **kwargs) for func, kwargs in jobs]
+        return [future.result() for future in futures]
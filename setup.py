@@ -5,11 +5,24 @@ setup(
     version="0.1",
     packages=find_packages(),
     install_requires=[
-        "dagster",
+        "dagster>=1.10.0",
         "dagster-duckdb",
-        "pandas",
-        "requests",
-        "matplotlib",
-        "python-dotenv",
+        "duckdb>=1.0.0",
+        "numpy>=1.24",  # Signature numba explicite, np.add.reduceat sur vues décimées
+        "pandas>=2.2.0",
+        "requests>=2.31.0",
+        "urllib3>=2.0",  # Retry(backoff_jitter=...) n'existe qu'à partir de urllib3 2.0
+        "requests-cache>=1.2.0",
+        "matplotlib>=3.8.0",  # Rendu Agg uniquement : aucun backend graphique n'est requis
+        "Pillow>=10.0.0",  # Encodage PNG du tampon Agg (utils/visualization.py)
+        "pyarrow>=15.0.0",  # Tables Arrow échangées sans copie avec DuckDB et Parquet
+        "python-dotenv>=1.0.0",
     ],
+    extras_require={
+        # Décodage JSON plus rapide des réponses CoinGecko (repli sur json sinon)
+        # et normalisation des graphiques comparatifs compilée par numba (repli sur NumPy sinon)
+        "fast": ["orjson", "numba"],
+        # Backend Qt pour afficher les graphiques de manière interactive (hors pipeline)
+        "gui": ["PyQt6"],
+    },
 ) 
\ No newline at end of file